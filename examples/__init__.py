@@ -1,3 +0,0 @@
-from . import example_coding, example_creative_writing, example_science
-
-__all__ = ["example_coding", "example_creative_writing", "example_science"]
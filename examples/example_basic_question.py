@@ -1,8 +1,4 @@
-import os
-import sys
-
-# Add the parent directory to sys.path
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import asyncio
 
 from promptwright import DataEngine, EngineArguments, TopicTree, TopicTreeArguments
 
@@ -19,7 +15,7 @@ tree = TopicTree(
     )
 )
 
-tree.build_tree()
+asyncio.run(tree.build_tree_async())
 tree.save("basic_question_tt.jsonl")
 
 engine = DataEngine(
@@ -32,11 +28,12 @@ engine = DataEngine(
     )
 )
 
-dataset = engine.create_data(
-    num_steps=5,
-    batch_size=1,
-    topic_tree=tree,
-    model_name="ollama/mistral-nemo:latest",
+dataset = asyncio.run(
+    engine.create_data_async(
+        num_steps=5,
+        batch_size=1,
+        topic_tree=tree,
+        stream_to="basic_question.jsonl",  # Write samples to disk as they are generated
+        model_name="ollama/mistral-nemo:latest",
+    )
 )
-
-dataset.save("basic_question.jsonl")
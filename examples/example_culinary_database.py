@@ -1,14 +1,18 @@
-import os
-import sys
-
-# Add the parent directory to sys.path
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import asyncio
 
 from promptwright import DataEngine, EngineArguments, TopicTree, TopicTreeArguments
 
 system_prompt = """You are a culinary expert who documents recipes and cooking techniques.
 Your entries should be detailed, precise, and include both traditional and modern cooking methods."""
 
+instructions = """Create detailed recipe and technique entries that include:
+- Ingredient lists with possible substitutions
+- Step-by-step instructions
+- Critical technique explanations
+- Common mistakes to avoid
+- Storage and serving suggestions
+- Cultural context and history"""
+
 tree = TopicTree(
     args=TopicTreeArguments(
         root_prompt="Global Cuisine and Cooking Techniques",  # Root prompt for the tree
@@ -20,18 +24,12 @@ tree = TopicTree(
     )
 )
 
-tree.build_tree()
+asyncio.run(tree.build_tree_async())
 tree.save("culinary_techniques_tree.jsonl")
 
 engine = DataEngine(
     args=EngineArguments(
-        instructions="""Create detailed recipe and technique entries that include:
-                       - Ingredient lists with possible substitutions
-                       - Step-by-step instructions
-                       - Critical technique explanations
-                       - Common mistakes to avoid
-                       - Storage and serving suggestions
-                       - Cultural context and history""",  # Instructions for the model
+        instructions=instructions,  # Instructions for the model
         system_prompt=system_prompt,  # System prompt for the model
         model_name="ollama/llama3",  # Model name
         temperature=0.1,  # Balance between creativity and precision
@@ -39,10 +37,11 @@ engine = DataEngine(
     )
 )
 
-dataset = engine.create_data(
-    num_steps=15,  # Generate 15 entries
-    batch_size=2,  # Generate 2 entries at a time
-    topic_tree=tree,
+dataset = asyncio.run(
+    engine.create_data_async(
+        num_steps=15,  # Generate 15 entries
+        batch_size=2,  # Generate 2 entries at a time
+        topic_tree=tree,
+        stream_to="culinary_database.jsonl",  # Write samples to disk as they are generated
+    )
 )
-
-dataset.save("culinary_database.jsonl")
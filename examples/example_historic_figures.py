@@ -1,13 +1,14 @@
-import os
-import sys
-
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import asyncio
 
 from promptwright import DataEngine, EngineArguments, TopicTree, TopicTreeArguments
 
 system_prompt = """You are a knowledgeable historian who creates detailed, accurate biographical entries.
 Each entry should include: birth/death dates, major achievements, historical impact, and interesting anecdotes."""
 
+instructions = """Generate biographical entries for historical figures.
+Include lesser-known details and focus on their lasting impact.
+Each entry should be engaging while maintaining historical accuracy."""
+
 tree = TopicTree(
     args=TopicTreeArguments(
         root_prompt="Notable Historical Figures Across Different Eras and Fields",
@@ -19,14 +20,12 @@ tree = TopicTree(
     )
 )
 
-tree.build_tree()
+asyncio.run(tree.build_tree_async())
 tree.save("historical_figures_tree.jsonl")
 
 engine = DataEngine(
     args=EngineArguments(
-        instructions="""Generate biographical entries for historical figures.
-                       Include lesser-known details and focus on their lasting impact.
-                       Each entry should be engaging while maintaining historical accuracy.""",  # Instructions for the model
+        instructions=instructions,  # Instructions for the model
         system_prompt=system_prompt,  # System prompt for the model
         model_name="ollama/llama3",  # Model name
         temperature=0.7,  # Balance between creativity and accuracy
@@ -35,10 +34,11 @@ engine = DataEngine(
 )
 
 
-dataset = engine.create_data(
-    num_steps=15,  # Generate 15 entries
-    batch_size=2,  # Generate 2 entries at a time
-    topic_tree=tree,
+dataset = asyncio.run(
+    engine.create_data_async(
+        num_steps=15,  # Generate 15 entries
+        batch_size=2,  # Generate 2 entries at a time
+        topic_tree=tree,
+        stream_to="historical_figures_database.jsonl",  # Write samples to disk as they are generated
+    )
 )
-
-dataset.save("historical_figures_database.jsonl")
@@ -1,13 +1,18 @@
-import os
-import sys
-
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import asyncio
 
 from promptwright import DataEngine, EngineArguments, TopicTree, TopicTreeArguments
 
 system_prompt = """You are an expert programming instructor who creates engaging coding challenges.
 Each challenge should test specific programming concepts while remaining accessible and educational."""
 
+instructions = """Generate programming challenges that include:
+- Problem description
+- Input/Output examples
+- Constraints and edge cases
+- Hint system (progressive hints)
+- Solution approach discussion
+- Time/Space complexity requirements"""
+
 tree = TopicTree(
     args=TopicTreeArguments(
         root_prompt="Programming Challenges Across Different Difficulty Levels and Concepts",  # Root prompt for the tree
@@ -19,18 +24,12 @@ tree = TopicTree(
     )
 )
 
-tree.build_tree()
+asyncio.run(tree.build_tree_async())
 tree.save("programming_challenges_tree.jsonl")
 
 engine = DataEngine(
     args=EngineArguments(
-        instructions="""Generate programming challenges that include:
-                       - Problem description
-                       - Input/Output examples
-                       - Constraints and edge cases
-                       - Hint system (progressive hints)
-                       - Solution approach discussion
-                       - Time/Space complexity requirements""",  # Instructions for the model
+        instructions=instructions,  # Instructions for the model
         system_prompt=system_prompt,  # System prompt for the model
         model_name="ollama/llama3",  # Model name
         temperature=0.8,  # Higher temperature for creative problem scenarios
@@ -38,10 +37,11 @@ engine = DataEngine(
     )
 )
 
-dataset = engine.create_data(
-    num_steps=6,
-    batch_size=2,
-    topic_tree=tree,
+dataset = asyncio.run(
+    engine.create_data_async(
+        num_steps=6,
+        batch_size=2,
+        topic_tree=tree,
+        stream_to="programming_challenges.jsonl",  # Write samples to disk as they are generated
+    )
 )
-
-dataset.save("programming_challenges.jsonl")
@@ -1,8 +1,4 @@
 import os
-import sys
-
-# Add the parent directory to sys.path
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from promptwright import HFUploader
 
@@ -1,11 +1,18 @@
 """PromptWright - A tool for generating training data for language models."""
 
-from .cli import cli
-from .config import PromptWrightConfig
-from .dataset import Dataset
-from .engine import DataEngine, EngineArguments
-from .hf_hub import HFUploader
-from .topic_tree import TopicTree, TopicTreeArguments
+import importlib
+import sys
+import types
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .cli import cli
+    from .config import PromptWrightConfig
+    from .dataset import Dataset
+    from .engine import DataEngine, EngineArguments
+    from .hf_hub import HFUploader
+    from .topic_tree import TopicTree, TopicTreeArguments
 
 __version__ = "0.1.0"
 
@@ -19,3 +26,45 @@ __all__ = [
     "PromptWrightConfig",
     "cli",
 ]
+
+# Public names are imported from their submodule on first access (PEP 562), so
+# e.g. `from promptwright import Dataset` does not pull in litellm, and only the
+# CLI and HFUploader pay for importing datasets/huggingface_hub.
+_LAZY_IMPORTS = {
+    "TopicTree": ".topic_tree",
+    "TopicTreeArguments": ".topic_tree",
+    "DataEngine": ".engine",
+    "EngineArguments": ".engine",
+    "Dataset": ".dataset",
+    "HFUploader": ".hf_hub",
+    "PromptWrightConfig": ".config",
+    "cli": ".cli",
+}
+
+
+def __getattr__(name: str):
+    module_name = _LAZY_IMPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")  # noqa: TRY003
+
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    # Cache on the package so later lookups skip __getattr__
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | set(__all__))
+
+
+class _Package(types.ModuleType):
+    def __setattr__(self, name, value):
+        # Importing the promptwright.cli submodule (the console script, mock.patch
+        # targets) binds it on the package under the same name, which would
+        # shadow the lazily resolved command. Keep the click group there instead.
+        if name == "cli" and isinstance(value, types.ModuleType):
+            value = value.cli
+        super().__setattr__(name, value)
+
+
+sys.modules[__name__].__class__ = _Package
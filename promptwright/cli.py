@@ -3,14 +3,20 @@
 import os
 import sys
 
-import click
-import yaml
-
-from .config import PromptWrightConfig, construct_model_string
-from .engine import DataEngine
-from .hf_hub import HFUploader
-from .topic_tree import TopicTree, TopicTreeArguments
-from .utils import read_topic_tree_from_jsonl
+# LiteLLM fetches its model cost map over the network on import. The CLI never
+# uses pricing data, so use the copy bundled with LiteLLM instead of paying for
+# that request on every run, unless the user has set it explicitly. This has to
+# happen before .engine imports litellm.
+os.environ.setdefault("LITELLM_LOCAL_MODEL_COST_MAP", "True")
+
+import click  # noqa: E402
+import yaml  # noqa: E402
+
+from .config import PromptWrightConfig, construct_model_string  # noqa: E402
+from .engine import DataEngine  # noqa: E402
+from .hf_hub import HFUploader  # noqa: E402
+from .topic_tree import TopicTree, TopicTreeArguments  # noqa: E402
+from .utils import read_topic_tree_from_jsonl  # noqa: E402
 
 
 def handle_error(ctx: click.Context, error: Exception) -> None:  # noqa: ARG001
@@ -4,6 +4,12 @@ from dataclasses import dataclass
 
 import yaml
 
+# libyaml's C loader is several times faster; PyYAML builds without it fall back
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
 from .engine import EngineArguments
 from .topic_tree import TopicTreeArguments
 
@@ -27,7 +33,7 @@ class PromptWrightConfig:
     def from_yaml(cls, yaml_path: str) -> "PromptWrightConfig":
         """Load configuration from a YAML file."""
         with open(yaml_path) as f:
-            config_dict = yaml.safe_load(f)
+            config_dict = yaml.load(f, Loader=SafeLoader)
 
         return cls(
             system_prompt=config_dict.get("system_prompt", ""),
@@ -64,6 +70,9 @@ class PromptWrightConfig:
             tree_depth=args.get("tree_depth", 2),
             temperature=args.get("temperature", 0.7),
             model_name=args["model_name"],
+            cache_path=args.get("cache_path"),
+            subtopic_batch_size=args.get("subtopic_batch_size", 1),
+            max_concurrency=args.get("max_concurrency", 4),
         )
 
     def get_engine_args(self, **overrides) -> EngineArguments:
@@ -97,6 +106,8 @@ class PromptWrightConfig:
             temperature=args.get("temperature", 0.9),
             max_retries=args.get("max_retries", 2),
             sys_msg=sys_msg,
+            model_hosts=args.get("model_hosts"),
+            max_concurrency=args.get("max_concurrency"),
         )
 
     def get_dataset_config(self) -> dict:
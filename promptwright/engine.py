@@ -1,10 +1,15 @@
+import asyncio
+import itertools
 import json
 import math
 import random
-import re
+import time
 
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from dataclasses import dataclass
-from typing import TYPE_CHECKING, Any
+from typing import TYPE_CHECKING, Any, BinaryIO
 
 import litellm
 
@@ -13,25 +18,49 @@ from tqdm import tqdm
 from .dataset import Dataset
 from .prompts import ENGINE_JSON_INSTRUCTIONS, SAMPLE_GENERATION_PROMPT
 from .topic_tree import TopicTree
+from .utils import (
+    CODE_FENCE_RE,
+    compile_prompt_template,
+    extract_enclosed,
+    json_dumps_line,
+    json_loads,
+    render_prompt_template,
+    retry_delay,
+    should_retry,
+)
 
 # Handle circular import for type hints
 if TYPE_CHECKING:
     from .topic_tree import TopicTree
 
 
+# In-flight request limit for create_data_async when max_concurrency is unset
+DEFAULT_MAX_CONCURRENCY = 4
+
+
 def validate_json_response(
     json_str: str, schema: dict[str, Any] | None = None
 ) -> dict | None:
     """Validate and clean JSON response from LLM."""
     try:
-        json_match = re.search(r"(?s)\{.*\}", json_str)
-        if not json_match:
+        # Most responses are a bare JSON object, which parses without any regex work
+        stripped = json_str.strip()
+        if stripped.startswith("{") and stripped.endswith("}"):
+            try:
+                parsed = json_loads(stripped)
+            except json.JSONDecodeError:
+                parsed = None
+            if isinstance(parsed, dict) and schema is None:
+                return parsed
+
+        cleaned_json = extract_enclosed(json_str, "{", "}")
+        if cleaned_json is None:
             return None
 
-        cleaned_json = json_match.group(0)
-        cleaned_json = re.sub(r"```json\s*|\s*```", "", cleaned_json)
+        if "```" in cleaned_json:
+            cleaned_json = CODE_FENCE_RE.sub("", cleaned_json)
 
-        parsed = json.loads(cleaned_json)
+        parsed = json_loads(cleaned_json)
 
         if schema is not None:
             # Schema validation could be added here
@@ -55,6 +84,10 @@ class EngineArguments:
     default_num_examples: int = 3
     request_timeout: int = 30
     sys_msg: bool = True  # Default to True for including system message
+    # Max in-flight requests. None sends each create_data step all at once and
+    # lets create_data_async use DEFAULT_MAX_CONCURRENCY
+    max_concurrency: int | None = None
+    model_hosts: list[str] | None = None  # API base URLs to round-robin requests across
 
 
 class DataEngine:
@@ -84,8 +117,21 @@ class DataEngine:
         }
         # Store original system prompt for dataset inclusion
         self.original_system_prompt = args.system_prompt
+        self.system_message = {"role": "system", "content": args.system_prompt}
+        # Cycle through model_hosts so requests are spread across every server
+        self._hosts = itertools.cycle(args.model_hosts) if args.model_hosts else None
+        # Open JSONL file that accepted samples are appended to while streaming
+        self._stream_file: BinaryIO | None = None
+        # Example samples are formatted once here rather than for every prompt
+        self._example_texts = (
+            [str(sample) for sample in args.example_data.samples]
+            if args.example_data is not None
+            else []
+        )
         # Use ENGINE_JSON_INSTRUCTIONS only for generation prompt
         self.generation_system_prompt = ENGINE_JSON_INSTRUCTIONS + args.system_prompt
+        # The instructions block is the same for every prompt, so build it once
+        self._instructions_text = self.build_custom_instructions_text()
 
     def analyze_failure(self, response_content: str, error: Exception = None) -> str:
         """Analyze the failure reason for a sample."""
@@ -119,27 +165,34 @@ class DataEngine:
         # Add example failures for each category
         for category, failures in self.failure_analysis.items():
             if failures:
-                # Get up to 3 examples for each category
-                examples = failures[:3]
+                # Get up to 3 examples for each category, formatting each only once
                 summary["failure_examples"][category] = [
-                    (
-                        str(ex)[:200] + "..."
-                        if len(str(ex)) > 200  # noqa: PLR2004
-                        else str(ex)  # noqa: PLR2004
-                    )  # noqa: PLR2004
-                    for ex in examples
+                    text[:200] + "..." if len(text) > 200 else text  # noqa: PLR2004
+                    for text in map(str, failures[:3])
                 ]
         return summary
 
-    def create_data(  # noqa: PLR0912
+    def _next_host(self) -> dict[str, str]:
+        """Return the api_base for the next request, or nothing if no hosts are set."""
+        if self._hosts is None:
+            return {}
+        return {"api_base": next(self._hosts)}
+
+    def _record_error(self, error: Exception) -> None:
+        """Record a request that failed on its final attempt."""
+        self.failed_samples.append(str(error))
+        failure_type = self.analyze_failure(str(error), error=error)
+        self.failure_analysis[failure_type].append(str(error))
+
+    def _prepare_generation(
         self,
-        num_steps: int = None,
-        num_example_demonstrations: int = 3,
-        batch_size: int = 10,
-        topic_tree: TopicTree = None,
-        model_name: str = None,
-        sys_msg: bool = None,  # Allow overriding sys_msg from args
-    ):
+        num_steps: int | None,
+        batch_size: int,
+        topic_tree: TopicTree | None,
+        model_name: str | None,
+        sys_msg: bool | None,
+    ) -> tuple[int, list | None, bool]:
+        """Validate generation arguments and select the topic tree paths to use."""
         if num_steps is None:
             raise ValueError("num_steps must be specified")  # noqa: TRY003
 
@@ -152,8 +205,6 @@ class DataEngine:
         # Use provided sys_msg or fall back to args.sys_msg
         include_sys_msg = sys_msg if sys_msg is not None else self.args.sys_msg
 
-        data_creation_prompt = SAMPLE_GENERATION_PROMPT
-
         tree_paths = None
         if topic_tree is not None:
             tree_paths = topic_tree.tree_paths
@@ -168,6 +219,200 @@ class DataEngine:
             tree_paths = random.sample(tree_paths, required_samples)
             num_steps = math.ceil(len(tree_paths) / batch_size)
 
+        return num_steps, tree_paths, include_sys_msg
+
+    def _parse_responses(
+        self, response_contents: list[str], include_sys_msg: bool
+    ) -> list[dict]:
+        """Parse raw LLM responses into samples, recording any that fail."""
+        samples = []
+        for response_content in response_contents:
+            parsed_json = validate_json_response(response_content)
+
+            if parsed_json and include_sys_msg:
+                # Start with the configured system message if sys_msg is True. A
+                # system message the model wrote itself is replaced, not kept
+                messages = parsed_json.get("messages")
+                if isinstance(messages, list):
+                    if (
+                        messages
+                        and isinstance(messages[0], dict)
+                        and messages[0].get("role") == "system"
+                    ):
+                        messages[0] = self.system_message.copy()
+                    else:
+                        # Build the list with the system message first in one
+                        # allocation rather than shifting every message along
+                        # with insert(0, ...)
+                        parsed_json["messages"] = [self.system_message.copy(), *messages]
+
+            if parsed_json:
+                samples.append(parsed_json)
+            else:
+                self.failed_samples.append(response_content)
+                failure_type = self.analyze_failure(response_content)
+                self.failure_analysis[failure_type].append(response_content)
+        return samples
+
+    def _add_to_dataset(self, samples: list[dict]) -> int:
+        """Add parsed samples to the dataset and return how many were accepted."""
+        start = len(self.dataset)
+        failed_samples, failure_descriptions = self.dataset.add_samples(samples)
+        if self._stream_file is not None:
+            for sample in self.dataset.samples[start:]:
+                self._stream_file.write(json_dumps_line(sample))
+        if failed_samples:
+            for sample, desc in zip(
+                failed_samples,
+                failure_descriptions,
+                strict=True,
+            ):
+                self.failed_samples.append(sample)
+                self.failure_analysis["invalid_schema"].append(desc)
+        return len(samples) - len(failed_samples)
+
+    @contextmanager
+    def _stream_samples(self, stream_to: str | None) -> Iterator[None]:
+        """Append accepted samples to stream_to as they are generated."""
+        if stream_to is None:
+            yield
+            return
+
+        with open(stream_to, "wb", buffering=1 << 20) as f:
+            self._stream_file = f
+            try:
+                yield
+            finally:
+                self._stream_file = None
+
+    def _batch_completion(self, pending: list[list[dict]]) -> list:
+        """Send prompts through litellm.batch_completion, split across model_hosts.
+
+        Prompts are dealt round-robin to the hosts and each host's share goes out
+        in its own batch_completion call, all at the same time, so every server
+        works on the step together. max_concurrency, if set, limits the requests
+        in flight across all hosts. Responses come back in the order of pending,
+        with failed requests as exceptions.
+        """
+        # Without max_concurrency every prompt in the step is sent at once
+        limit = self.args.max_concurrency or len(pending)
+        # max_concurrency caps the step as a whole, so with more hosts than the
+        # limit allows only that many of them take part in each step
+        num_groups = min(len(self.args.model_hosts or [None]), limit, len(pending))
+
+        def complete(
+            messages: list[list[dict]], host: dict[str, str], max_workers: int
+        ) -> list:
+            try:
+                # batch_completion returns failed requests as exceptions
+                return litellm.batch_completion(
+                    model=self.model_name,
+                    messages=messages,
+                    temperature=self.args.temperature,
+                    max_workers=min(len(messages), max_workers),
+                    **host,
+                )
+            except Exception as e:
+                return [e] * len(messages)
+
+        if num_groups == 1:
+            return complete(pending, self._next_host(), limit)
+
+        groups = [pending[i::num_groups] for i in range(num_groups)]
+        # Split the limit between the hosts so the workers add up to it exactly
+        workers = [
+            limit // num_groups + (i < limit % num_groups) for i in range(num_groups)
+        ]
+        with ThreadPoolExecutor(max_workers=num_groups) as executor:
+            results = list(
+                executor.map(
+                    complete, groups, [self._next_host() for _ in groups], workers
+                )
+            )
+        # Undo the round-robin split
+        responses = [None] * len(pending)
+        for i, group_responses in enumerate(results):
+            responses[i::num_groups] = group_responses
+        return responses
+
+    def _generate_batch(
+        self, prompts: list[str], include_sys_msg: bool, pbar: tqdm
+    ) -> None:
+        """Generate one step's prompts, resending only those without a sample yet."""
+        # Build each prompt's message list once; retries resend the same objects
+        pending = [[{"role": "user", "content": p}] for p in prompts]
+        for attempt in range(self.args.max_retries):
+            responses = self._batch_completion(pending)
+
+            retry_messages = []
+            errors = []
+            added = 0
+            for messages, response in zip(pending, responses, strict=True):
+                try:
+                    if isinstance(response, Exception):
+                        raise response  # noqa: TRY301
+                    samples = self._parse_responses(
+                        [response.choices[0].message.content],
+                        include_sys_msg,
+                    )
+                except Exception as e:
+                    if should_retry(e):
+                        errors.append(e)
+                        retry_messages.append(messages)
+                    else:
+                        # Resending a request the provider rejected cannot help
+                        print(f"Failed after {attempt + 1} attempts: {str(e)}")
+                        self._record_error(e)
+                    continue
+
+                if samples:
+                    added += self._add_to_dataset(samples)
+                else:
+                    retry_messages.append(messages)
+
+            # One progress update per attempt instead of one per response
+            pbar.update(added)
+            pending = retry_messages
+            if not pending:
+                return
+
+            if attempt == self.args.max_retries - 1:
+                for e in errors:
+                    print(f"Failed after {self.args.max_retries} attempts: {str(e)}")
+                    self._record_error(e)
+            elif errors:
+                print(f"Attempt {attempt + 1} failed: {str(errors[0])}")
+                time.sleep(max(retry_delay(attempt, e) for e in errors))
+
+    def create_data(
+        self,
+        num_steps: int = None,
+        num_example_demonstrations: int = 3,
+        batch_size: int = 10,
+        topic_tree: TopicTree = None,
+        model_name: str = None,
+        sys_msg: bool = None,  # Allow overriding sys_msg from args
+        stream_to: str = None,
+    ):
+        """Generate the dataset in num_steps batches of batch_size samples.
+
+        Every prompt in a step is submitted in a single litellm.batch_completion
+        call, which sends them to the provider concurrently, so a local Ollama
+        server started with OLLAMA_NUM_PARALLEL >= batch_size can serve the whole
+        step as one batch. Set max_concurrency in EngineArguments to send fewer
+        requests at a time. If model_hosts is set, each step's prompts are split
+        across the hosts, which serve their shares at the same time.
+
+        If stream_to is given, each accepted sample is also appended to that JSONL
+        file as soon as it is generated, so a long run leaves its progress on
+        disk instead of only in memory.
+        """
+        num_steps, tree_paths, include_sys_msg = self._prepare_generation(
+            num_steps, batch_size, topic_tree, model_name, sys_msg
+        )
+
+        data_creation_prompt = SAMPLE_GENERATION_PROMPT
+
         total_samples = num_steps * batch_size
         print(f"Generating dataset using model {self.model_name}")
         print(f"Generating dataset in {num_steps} steps, with batch size {batch_size}")
@@ -176,94 +421,151 @@ class DataEngine:
         litellm.enable_json_schema_validation = True
 
         try:
-            with tqdm(total=total_samples, desc="Progress") as pbar:
+            with self._stream_samples(stream_to), tqdm(
+                total=total_samples,
+                desc="Progress",
+                mininterval=0.5,
+                miniters=max(1, total_samples // 200),
+            ) as pbar:
                 for step in range(num_steps):
-                    prompts = []
                     start_idx = step * batch_size
-
-                    for i in range(batch_size):
-                        path = None
-                        if tree_paths:
-                            current_idx = start_idx + i
-                            if current_idx < len(tree_paths):
-                                path = tree_paths[current_idx]
-                            else:
-                                break
-
-                        sample_prompt = self.build_prompt(
+                    # The last step's slice is shorter if the paths run out
+                    batch_paths = (
+                        tree_paths[start_idx : start_idx + batch_size]
+                        if tree_paths
+                        else [None] * batch_size
+                    )
+
+                    prompts = [
+                        self.build_prompt(
                             data_creation_prompt=data_creation_prompt,
                             num_example_demonstrations=num_example_demonstrations,
                             subtopics_list=path,
                         )
-                        prompts.append(sample_prompt)
-
-                    for attempt in range(self.args.max_retries):
-                        try:
-                            # Prepare batch completion arguments
-                            completion_args = {
-                                "model": self.model_name,
-                                "messages": [
-                                    [{"role": "user", "content": p}] for p in prompts
-                                ],
-                                "temperature": self.args.temperature,
-                            }
-
-                            responses = litellm.batch_completion(**completion_args)
-
-                            samples = []
-                            for r in responses:
-                                response_content = r.choices[0].message.content
-                                parsed_json = validate_json_response(response_content)
-
-                                if parsed_json and include_sys_msg:  # noqa: SIM102
-                                    # Add system message at the start if sys_msg is True
-                                    if "messages" in parsed_json:
-                                        parsed_json["messages"].insert(
-                                            0,
-                                            {
-                                                "role": "system",
-                                                "content": self.original_system_prompt,
-                                            },
-                                        )
-
-                                if parsed_json:
-                                    samples.append(parsed_json)
-                                else:
-                                    self.failed_samples.append(response_content)
-                                    failure_type = self.analyze_failure(
-                                        response_content
-                                    )
-                                    self.failure_analysis[failure_type].append(
-                                        response_content
-                                    )
-
-                            if samples:
-                                failed_samples, failure_descriptions = (
-                                    self.dataset.add_samples(samples)
-                                )
-                                if failed_samples:
-                                    for sample, desc in zip(
-                                        failed_samples,
-                                        failure_descriptions,
-                                        strict=True,
-                                    ):
-                                        self.failed_samples.append(sample)
-                                        self.failure_analysis["invalid_schema"].append(
-                                            desc
-                                        )
-                                pbar.update(len(samples) - len(failed_samples))
-                                break  # Success - exit retry loop
-
-                        except Exception as e:
-                            if attempt == self.args.max_retries - 1:
-                                print(
-                                    f"Failed after {self.args.max_retries} attempts: {str(e)}"
-                                )
-                                self.failed_samples.append(str(e))
-                                failure_type = self.analyze_failure(str(e), error=e)
-                                self.failure_analysis[failure_type].append(str(e))
-                            else:
-                                print(f"Attempt {attempt + 1} failed: {str(e)}")
+                        for path in batch_paths
+                    ]
+
+                    self._generate_batch(prompts, include_sys_msg, pbar)
+
+        except KeyboardInterrupt:
+            print("\nGeneration interrupted by user.")
+            self.print_failure_summary()
+            self.save_dataset("interrupted_dataset.jsonl")
+            return self.dataset
+
+        except Exception as e:
+            print(f"\nUnexpected error: {str(e)}")
+            self.print_failure_summary()
+            self.save_dataset("error_dataset.jsonl")
+            raise
+
+        print(f"Successfully Generated {len(self.dataset)} samples.")
+        self.print_failure_summary()
+        return self.dataset
+
+    async def _agenerate_sample(
+        self,
+        prompt: str,
+        semaphore: asyncio.Semaphore,
+        include_sys_msg: bool,
+        pbar: tqdm,
+    ) -> None:
+        """Generate a single sample, retrying it on its own until it succeeds."""
+        # Build the message list once; retries resend the same object
+        messages = [{"role": "user", "content": prompt}]
+        for attempt in range(self.args.max_retries):
+            try:
+                async with semaphore:
+                    response = await litellm.acompletion(
+                        model=self.model_name,
+                        messages=messages,
+                        temperature=self.args.temperature,
+                        **self._next_host(),
+                    )
+
+                samples = self._parse_responses(
+                    [response.choices[0].message.content], include_sys_msg
+                )
+
+                if samples:
+                    pbar.update(self._add_to_dataset(samples))
+                    return
+
+            except Exception as e:
+                # Resending a request the provider rejected cannot help
+                if attempt == self.args.max_retries - 1 or not should_retry(e):
+                    print(f"Failed after {attempt + 1} attempts: {str(e)}")
+                    self._record_error(e)
+                    return
+                print(f"Attempt {attempt + 1} failed: {str(e)}")
+                await asyncio.sleep(retry_delay(attempt, e))
+
+    async def create_data_async(
+        self,
+        num_steps: int = None,
+        num_example_demonstrations: int = 3,
+        batch_size: int = 10,
+        topic_tree: TopicTree = None,
+        model_name: str = None,
+        sys_msg: bool = None,
+        max_concurrency: int = None,
+        stream_to: str = None,
+    ):
+        """Generate the dataset with every prompt scheduled concurrently.
+
+        Behaves like create_data, but rather than waiting for each batch to
+        finish before starting the next, all num_steps * batch_size prompts are
+        issued through litellm.acompletion with at most max_concurrency requests
+        in flight. When generating against Ollama, set OLLAMA_NUM_PARALLEL on the
+        server to at least max_concurrency so the requests are actually served
+        in parallel. stream_to works the same way as in create_data.
+
+        If model_hosts is set, successive requests are sent to each host in turn,
+        so several Ollama servers can share the load.
+        """
+        num_steps, tree_paths, include_sys_msg = self._prepare_generation(
+            num_steps, batch_size, topic_tree, model_name, sys_msg
+        )
+        max_concurrency = (
+            max_concurrency or self.args.max_concurrency or DEFAULT_MAX_CONCURRENCY
+        )
+
+        if tree_paths is None:
+            tree_paths = [None] * (num_steps * batch_size)
+
+        prompts = [
+            self.build_prompt(
+                data_creation_prompt=SAMPLE_GENERATION_PROMPT,
+                num_example_demonstrations=num_example_demonstrations,
+                subtopics_list=path,
+            )
+            for path in tree_paths
+        ]
+
+        print(f"Generating dataset using model {self.model_name}")
+        print(
+            f"Generating {len(prompts)} samples with up to {max_concurrency} concurrent requests"
+        )
+
+        # Enable JSON schema validation
+        litellm.enable_json_schema_validation = True
+
+        semaphore = asyncio.Semaphore(max_concurrency)
+        try:
+            with self._stream_samples(stream_to), tqdm(
+                total=len(prompts),
+                desc="Progress",
+                mininterval=0.5,
+                miniters=max(1, len(prompts) // 200),
+            ) as pbar:
+                await asyncio.gather(
+                    *(
+                        self._agenerate_sample(
+                            prompt, semaphore, include_sys_msg, pbar
+                        )
+                        for prompt in prompts
+                    )
+                )
 
         except KeyboardInterrupt:
             print("\nGeneration interrupted by user.")
@@ -271,6 +573,14 @@ class DataEngine:
             self.save_dataset("interrupted_dataset.jsonl")
             return self.dataset
 
+        except asyncio.CancelledError:
+            # Keep the partial dataset, but let timeouts and callers see the
+            # cancellation (asyncio.run also turns Ctrl+C into one)
+            print("\nGeneration cancelled.")
+            self.print_failure_summary()
+            self.save_dataset("interrupted_dataset.jsonl")
+            raise
+
         except Exception as e:
             print(f"\nUnexpected error: {str(e)}")
             self.print_failure_summary()
@@ -305,17 +615,14 @@ class DataEngine:
         num_example_demonstrations: int,
         subtopics_list: list[str] = None,
     ) -> str:
-        prompt = data_creation_prompt.replace(
-            "{{{{system_prompt}}}}", self.generation_system_prompt
-        )
-        prompt = prompt.replace(
-            "{{{{instructions}}}}", self.build_custom_instructions_text()
-        )
-        prompt = prompt.replace(
-            "{{{{examples}}}}", self.build_examples_text(num_example_demonstrations)
-        )
-        return prompt.replace(
-            "{{{{subtopics}}}}", self.build_subtopics_text(subtopics_list)
+        return render_prompt_template(
+            compile_prompt_template(data_creation_prompt),
+            {
+                "system_prompt": self.generation_system_prompt,
+                "instructions": self._instructions_text,
+                "examples": self.build_examples_text(num_example_demonstrations),
+                "subtopics": self.build_subtopics_text(subtopics_list),
+            },
         )
 
     def build_system_prompt(self):
@@ -331,11 +638,12 @@ class DataEngine:
         if self.args.example_data is None or num_example_demonstrations == 0:
             return ""
 
+        # Use every example if fewer are available than requested
         examples = random.sample(
-            self.args.example_data.samples, num_example_demonstrations
+            self._example_texts,
+            min(num_example_demonstrations, len(self._example_texts)),
         )
-        examples_text = "Here are output examples:\n\n"
-        examples_text += "\n".join(
+        examples_text = "\n".join(
             f"Example {i+1}: \n\n{ex}\n" for i, ex in enumerate(examples)
         )
         return (
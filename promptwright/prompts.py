@@ -75,6 +75,31 @@ desired number of subtopics: {{{{num_subtopics}}}}
 
 Now return the subtopics as a python list, and return it in just one line, not multiple ones. Don't return anything else."""
 
+TREE_BATCH_GENERATION_PROMPT = """I want to train a large language model and I am using another, bigger large language model to generate training data for this. However, if we always ask the bigger model to generate training data with the same prompt, it will end up generating very repetitive training samples. Therefore, we will slightly modify our prompt for each sampling procedure according to some aspects. For instance, when asking the model to generate news articles, we could modify the prompt to let the model tell news articles about particular topics, such as business or politics. To further generate training data, we will do this recursively, and generate submodifications to the prompt. For instance, within the domain of business, we could adapt the prompt to generate news about the stock market or business scandals, and within politics, we could ask the model to generate articles for subtopics like elections or climate policy. We do this recursively, and therefore, we get a tree-like structure of topics.
+Your job is to come up with a list of subtopics for each of several nodes of this tree at once. A node path is a list of topics from the root of the tree to the node, like "Small Talk Topics" -> "Hobbies" -> "Cooking". You will be given the system prompt for the model we want to train and a numbered list of node paths, and you should come up with the desired number of subtopics for every one of them.
+
+Example:
+node paths:
+0: "Small Talk Topics" -> "Family"
+1: "Small Talk Topics" -> "Hobbies" -> "Cooking"
+desired number of subtopics per node: 3
+subtopics: {"0": ["parents", "siblings", "family traditions"], "1": ["recipes", "asian food", "kitchen gadgets"]}
+
+
+Here is a description / the system prompt for the model we want to train:
+
+<system_prompt>
+{{{{system_prompt}}}}
+</system_prompt>
+
+
+Here are your node paths. When generating subtopics, remain somewhat vague. Things can only be tangentially related and they don't have to be interpreted in a single way. Importantly, make sure that the subtopics fit the system prompt, if one was supplied:
+node paths:
+{{{{node_paths}}}}
+desired number of subtopics per node: {{{{num_subtopics}}}}
+
+Now return the subtopics as a single JSON object that maps the number of each node path, as a string, to a JSON array of its subtopics, and return it in just one line. Don't return anything else."""
+
 TREE_JSON_INSTRUCTIONS = """When listing subtopics, format your response as a valid JSON array of strings.
 Example: ["topic 1", "topic 2", "topic 3"]
 1. Use double quotes for strings
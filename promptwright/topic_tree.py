@@ -1,29 +1,61 @@
+import asyncio
+import contextlib
+import hashlib
 import json
-import re
+import threading
 import time
 import warnings
 
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from typing import Any
 
 import litellm
 
-from .prompts import TREE_GENERATION_PROMPT, TREE_JSON_INSTRUCTIONS
-from .utils import extract_list
+from .prompts import (
+    TREE_BATCH_GENERATION_PROMPT,
+    TREE_GENERATION_PROMPT,
+    TREE_JSON_INSTRUCTIONS,
+)
+from .utils import (
+    CODE_FENCE_RE,
+    compile_prompt_template,
+    extract_enclosed,
+    extract_list,
+    is_transient_error,
+    json_dumps_line,
+    json_loads,
+    render_prompt_template,
+    retry_delay,
+    should_retry,
+)
 
 warnings.filterwarnings("ignore", message="Pydantic serializer warnings:.*")
 
+# Larger batches degrade subtopic quality and need very long responses
+MAX_SUBTOPIC_BATCH_SIZE = 8
+# Upper bound on the response length requested for a batch of nodes
+MAX_BATCH_TOKENS = 4000
+
 
 def validate_and_clean_response(response_text: str) -> str | list[str] | None:
     """Clean and validate the response from the LLM."""
     try:
-        # First try to extract a JSON array if present
-        json_match = re.search(r"\[.*\]", response_text, re.DOTALL)
-        if json_match:
-            cleaned_json = json_match.group(0)
+        # Most responses are a bare JSON array, which parses without any regex work
+        stripped = response_text.strip()
+        if stripped.startswith("[") and stripped.endswith("]"):
+            try:
+                return json_loads(stripped)
+            except json.JSONDecodeError:
+                pass
+
+        # Otherwise try to extract a JSON array if present
+        cleaned_json = extract_enclosed(response_text, "[", "]")
+        if cleaned_json is not None:
             # Remove any markdown code block markers
-            cleaned_json = re.sub(r"```json\s*|\s*```", "", cleaned_json)
-            return json.loads(cleaned_json)
+            if "```" in cleaned_json:
+                cleaned_json = CODE_FENCE_RE.sub("", cleaned_json)
+            return json_loads(cleaned_json)
 
         # If no JSON array found, fall back to extract_list
         topics = extract_list(response_text)
@@ -46,6 +78,10 @@ class TopicTreeArguments:
         tree_degree (int): The branching factor of the tree.
         tree_depth (int): The depth of the tree.
         model_name (str): The name of the model to be used.
+        temperature (float): The sampling temperature for subtopic generation.
+        max_concurrency (int): Max in-flight requests while building the tree.
+        cache_path (str | None): JSONL file caching generated subtopics across runs.
+        subtopic_batch_size (int): Sibling nodes build_tree expands per request.
     """
 
     root_prompt: str
@@ -54,6 +90,15 @@ class TopicTreeArguments:
     tree_depth: int = 3
     model_name: str = "ollama/llama3"
     temperature: float = 0.2
+    max_concurrency: int = 4
+    cache_path: str | None = None
+    subtopic_batch_size: int = 1
+
+    def __post_init__(self):
+        if not 1 <= self.subtopic_batch_size <= MAX_SUBTOPIC_BATCH_SIZE:
+            raise ValueError(  # noqa: TRY003
+                f"subtopic_batch_size must be between 1 and {MAX_SUBTOPIC_BATCH_SIZE}"
+            )
 
 
 class TopicTreeValidator:
@@ -120,21 +165,140 @@ class TopicTree:
         self.tree_depth = args.tree_depth
         self.tree_paths = []
         self.failed_generations = []
+        # Set when the cache file was cut off mid-line, so the next entry starts
+        # on a line of its own
+        self._cache_needs_newline = False
+        self._subtopic_cache = self._load_subtopic_cache(args.cache_path)
+        self._cache_lock = threading.Lock()
+
+    def _load_subtopic_cache(self, cache_path: str | None) -> dict[str, list[str]]:
+        """Load previously generated subtopics, keyed by request hash."""
+        cache = {}
+        if not cache_path:
+            return cache
+        # The first run has no cache file yet
+        with contextlib.suppress(FileNotFoundError), open(cache_path, "rb") as f:
+            for line_number, line in enumerate(f, 1):
+                self._cache_needs_newline = not line.endswith(b"\n")
+                try:
+                    entry = json_loads(line)
+                    cache[entry["key"]] = entry["subtopics"]
+                except (json.JSONDecodeError, KeyError, TypeError):
+                    # A run killed mid-write leaves a truncated last line
+                    print(
+                        f"Warning: Skipping unreadable line {line_number} in {cache_path}"
+                    )
+        return cache
 
-    def build_tree(self, model_name: str = None) -> None:
-        """Build the complete topic tree."""
+    def _subtopic_cache_key(
+        self, system_prompt: str, node_path: list[str], num_subtopics: int
+    ) -> str:
+        """Hash everything that determines the subtopics requested for a node."""
+        key = (
+            f"{self.model_name}|{self.temperature}|{system_prompt}|"
+            f"{' -> '.join(node_path)}|{num_subtopics}"
+        )
+        return hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+
+    def _cache_subtopics(self, key: str, subtopics: list[str]) -> None:
+        """Remember generated subtopics, appending them to cache_path if set."""
+        if not self.args.cache_path:
+            return
+        with self._cache_lock:
+            self._subtopic_cache[key] = subtopics
+            with open(self.args.cache_path, "ab") as f:
+                if self._cache_needs_newline:
+                    f.write(b"\n")
+                    self._cache_needs_newline = False
+                f.write(json_dumps_line({"key": key, "subtopics": subtopics}))
+
+    def build_tree(self, model_name: str = None, max_concurrency: int = None) -> None:
+        """Build the complete topic tree, expanding each level in a thread pool.
+
+        Every node on a level is expanded at once, with at most max_concurrency
+        requests in flight. If subtopic_batch_size is above 1, each request
+        asks for the subtopics of that many nodes at once. Paths come out in
+        the same order as a depth-first build.
+        """
         if model_name:
             self.model_name = model_name
 
+        max_concurrency = max_concurrency or self.args.max_concurrency
+
         print(f"Building the topic tree with model: {self.model_name}")
 
         try:
-            self.tree_paths = self.build_subtree(
-                [self.args.root_prompt],
-                self.system_prompt,
-                self.args.tree_degree,
-                self.args.tree_depth,
-                model_name=self.model_name,
+            frontier = [[str(self.args.root_prompt)]]
+            with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+                for _ in range(self.args.tree_depth):
+                    subnodes_per_path = self._expand_level(executor, frontier)
+                    frontier = [
+                        path + [subnode]
+                        for path, subnodes in zip(
+                            frontier, subnodes_per_path, strict=True
+                        )
+                        for subnode in self._clean_subnodes(subnodes)
+                    ]
+            self.tree_paths = frontier
+
+            print(f"Tree building complete. Generated {len(self.tree_paths)} paths.")
+            if self.failed_generations:
+                print(
+                    f"Warning: {len(self.failed_generations)} subtopic generations failed."
+                )
+
+        except Exception as e:
+            print(f"Error building tree: {str(e)}")
+            if self.tree_paths:
+                print("Saving partial tree...")
+                self.save("partial_tree.jsonl")
+            raise
+
+    def _expand_level(
+        self, executor: ThreadPoolExecutor, frontier: list[list[str]]
+    ) -> list[list[str]]:
+        """Generate the subtopics of every path in frontier, in frontier order."""
+        batch_size = self.args.subtopic_batch_size
+        if batch_size <= 1:
+            return list(
+                executor.map(
+                    lambda path: self.get_subtopics(
+                        self.system_prompt, path, self.args.tree_degree
+                    ),
+                    frontier,
+                )
+            )
+
+        batches = [
+            frontier[i : i + batch_size] for i in range(0, len(frontier), batch_size)
+        ]
+        subnodes_per_batch = executor.map(
+            lambda paths: self.get_subtopics_batch(paths, self.args.tree_degree),
+            batches,
+        )
+        return [subnodes for batch in subnodes_per_batch for subnodes in batch]
+
+    async def build_tree_async(
+        self, model_name: str = None, max_concurrency: int = None
+    ) -> None:
+        """Build the complete topic tree, expanding sibling subtrees concurrently.
+
+        Produces the same paths as build_tree, but expands nodes through
+        litellm.acompletion on the running event loop instead of a thread pool.
+        Each node's children are requested as soon as that node is expanded,
+        so one slow request only delays its own subtree, not the whole level.
+        """
+        if model_name:
+            self.model_name = model_name
+
+        max_concurrency = max_concurrency or self.args.max_concurrency
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        print(f"Building the topic tree with model: {self.model_name}")
+
+        try:
+            self.tree_paths = await self._build_subtree_async(
+                [str(self.args.root_prompt)], self.args.tree_depth, semaphore
             )
 
             print(f"Tree building complete. Generated {len(self.tree_paths)} paths.")
@@ -150,24 +314,114 @@ class TopicTree:
                 self.save("partial_tree.jsonl")
             raise
 
+    async def _build_subtree_async(
+        self, node_path: list[str], subtree_depth: int, semaphore: asyncio.Semaphore
+    ) -> list[list[str]]:
+        """Expand node_path and all of its children's subtrees concurrently."""
+        if subtree_depth == 0:
+            return [node_path]
+
+        subnodes = await self.get_subtopics_async(
+            self.system_prompt, node_path, self.args.tree_degree, semaphore
+        )
+        # gather keeps results in argument order, so paths stay in depth-first order
+        subtrees = await asyncio.gather(
+            *(
+                self._build_subtree_async(
+                    node_path + [subnode], subtree_depth - 1, semaphore
+                )
+                for subnode in self._clean_subnodes(subnodes)
+            )
+        )
+        return [path for subtree in subtrees for path in subtree]
+
+    @staticmethod
+    def _build_subtopics_prompt(
+        system_prompt: str, node_path: list[str], num_subtopics: int
+    ) -> str:
+        """Fill in the tree generation prompt for the given node."""
+        return render_prompt_template(
+            compile_prompt_template(TREE_GENERATION_PROMPT),
+            {
+                "system_prompt": system_prompt if system_prompt else "",
+                "subtopics_list": " -> ".join(node_path),
+                "num_subtopics": str(num_subtopics),
+            },
+        )
+
+    @staticmethod
+    def _parse_subtopics(response_text: str, num_subtopics: int) -> list[str] | None:
+        """Extract num_subtopics cleaned subtopics from a response, if it has enough."""
+        return TopicTree._select_subtopics(
+            validate_and_clean_response(response_text), num_subtopics
+        )
+
+    @staticmethod
+    def _select_subtopics(subtopics: Any, num_subtopics: int) -> list[str] | None:
+        """Return the first num_subtopics cleaned subtopics, if there are enough."""
+        if isinstance(subtopics, list) and len(subtopics) > 0:
+            # Validate and clean each subtopic
+            cleaned_subtopics = []
+            for topic in subtopics:
+                if isinstance(topic, str):
+                    # Keep more special characters but ensure JSON safety
+                    cleaned_topic = topic.strip()
+                    if cleaned_topic:
+                        cleaned_subtopics.append(cleaned_topic)
+
+            if len(cleaned_subtopics) >= num_subtopics:
+                return cleaned_subtopics[:num_subtopics]
+
+        return None
+
+    def _default_subtopics(
+        self, node_path: list[str], num_subtopics: int, retries: int, last_error: str
+    ) -> list[str]:
+        """Record a failed generation and return placeholder subtopics."""
+        default_subtopics = [
+            f"subtopic_{i+1}_for_{node_path[-1]}" for i in range(num_subtopics)
+        ]
+        self.failed_generations.append(
+            {"path": node_path, "attempts": retries, "last_error": last_error}
+        )
+        print(
+            f"Failed to generate valid subtopics after {retries} attempts. Using default subtopics."
+        )
+        return default_subtopics
+
+    @staticmethod
+    def _clean_subnodes(subnodes: list) -> list[str]:
+        """Convert generated subnodes into strings usable as path labels."""
+        cleaned_subnodes = []
+        for subnode in subnodes:
+            try:
+                if isinstance(subnode, dict | list):
+                    cleaned_subnodes.append(json.dumps(subnode))
+                else:
+                    cleaned_subnodes.append(str(subnode))
+            except Exception as e:
+                print(f"Error cleaning subnode: {str(e)}")
+                continue
+        return cleaned_subnodes
+
     def get_subtopics(
         self, system_prompt: str, node_path: list[str], num_subtopics: int
     ) -> list[str]:
         """Generate subtopics with improved error handling and validation."""
         print(f"Generating {num_subtopics} subtopics for: {' -> '.join(node_path)}")
 
-        prompt = TREE_GENERATION_PROMPT
-        prompt = prompt.replace(
-            "{{{{system_prompt}}}}", system_prompt if system_prompt else ""
-        )
-        prompt = prompt.replace("{{{{subtopics_list}}}}", " -> ".join(node_path))
-        prompt = prompt.replace("{{{{num_subtopics}}}}", str(num_subtopics))
+        cache_key = self._subtopic_cache_key(system_prompt, node_path, num_subtopics)
+        if cache_key in self._subtopic_cache:
+            return self._subtopic_cache[cache_key]
+
+        prompt = self._build_subtopics_prompt(system_prompt, node_path, num_subtopics)
 
         max_retries = 3
         retries = 0
         last_error = "No error recorded"
 
         while retries < max_retries:
+            error = None
             try:
                 # Prepare completion arguments
                 completion_args = {
@@ -179,47 +433,170 @@ class TopicTree:
 
                 response = litellm.completion(**completion_args)
 
-                subtopics = validate_and_clean_response(
-                    response.choices[0].message.content
+                subtopics = self._parse_subtopics(
+                    response.choices[0].message.content, num_subtopics
                 )
+                if subtopics:
+                    self._cache_subtopics(cache_key, subtopics)
+                    return subtopics
 
-                if subtopics and len(subtopics) > 0:
-                    # Validate and clean each subtopic
-                    cleaned_subtopics = []
-                    for topic in subtopics:
-                        if isinstance(topic, str):
-                            # Keep more special characters but ensure JSON safety
-                            cleaned_topic = topic.strip()
-                            if cleaned_topic:
-                                cleaned_subtopics.append(cleaned_topic)
+                last_error = "Insufficient valid subtopics generated"
+                print(f"Attempt {retries + 1}: {last_error}. Retrying...")
 
-                    if len(cleaned_subtopics) >= num_subtopics:
-                        return cleaned_subtopics[:num_subtopics]
+            except Exception as e:
+                error = e
+                last_error = str(e)
+                print(
+                    f"Error generating subtopics (attempt {retries + 1}/{max_retries}): {last_error}"
+                )
+                if not should_retry(e):
+                    # Resending a request the provider rejected cannot help
+                    retries += 1
+                    break
+
+            retries += 1
+            if retries < max_retries:
+                time.sleep(retry_delay(retries, error))
+
+        # If all retries failed, generate default subtopics and log the failure
+        return self._default_subtopics(node_path, num_subtopics, retries, last_error)
+
+    def get_subtopics_batch(
+        self, node_paths: list[list[str]], num_subtopics: int
+    ) -> list[list[str]]:
+        """Generate subtopics for several nodes with a single request.
+
+        Nodes that are cached are not sent. Any node the response does not
+        cover with enough valid subtopics falls back to its own get_subtopics
+        call, so every node still gets retries and default subtopics. Transient
+        provider errors are retried with backoff rather than turning into a
+        request per node; if they persist, every node sent gets default
+        subtopics and a failed_generations entry.
+        """
+        keys = [
+            self._subtopic_cache_key(self.system_prompt, path, num_subtopics)
+            for path in node_paths
+        ]
+        results = [self._subtopic_cache.get(key) for key in keys]
+        missing = [i for i, subtopics in enumerate(results) if subtopics is None]
+
+        if len(missing) > 1:
+            print(f"Generating {num_subtopics} subtopics for {len(missing)} nodes")
+            prompt = render_prompt_template(
+                compile_prompt_template(TREE_BATCH_GENERATION_PROMPT),
+                {
+                    "system_prompt": self.args.model_system_prompt or "",
+                    "node_paths": "\n".join(
+                        f"{n}: {' -> '.join(node_paths[i])}"
+                        for n, i in enumerate(missing)
+                    ),
+                    "num_subtopics": str(num_subtopics),
+                },
+            )
+            max_retries = 3
+            for attempt in range(max_retries):
+                try:
+                    response = litellm.completion(
+                        model=self.model_name,
+                        max_tokens=min(1000 * len(missing), MAX_BATCH_TOKENS),
+                        temperature=self.temperature,
+                        messages=[{"role": "user", "content": prompt}],
+                    )
+                    text = response.choices[0].message.content
+                    subtopics_by_index = json_loads(extract_enclosed(text, "{", "}"))
+                    break
+                except Exception as e:
+                    if not is_transient_error(e):
+                        print(f"Error generating batched subtopics: {str(e)}")
+                        subtopics_by_index = {}
+                        break
+                    print(f"Error generating batched subtopics: {str(e)}")
+                    # Falling back to one request per node would only add load to
+                    # a provider that is already struggling, so wait it out instead
+                    # and give up on the whole batch if the error persists
+                    if attempt == max_retries - 1:
+                        for i in missing:
+                            results[i] = self._default_subtopics(
+                                node_paths[i], num_subtopics, max_retries, str(e)
+                            )
+                        subtopics_by_index = {}
+                        break
+                    time.sleep(retry_delay(attempt, e))
+
+            if isinstance(subtopics_by_index, dict):
+                for n, i in enumerate(missing):
+                    subtopics = self._select_subtopics(
+                        subtopics_by_index.get(str(n)), num_subtopics
+                    )
+                    if subtopics:
+                        self._cache_subtopics(keys[i], subtopics)
+                        results[i] = subtopics
+
+        return [
+            subtopics
+            if subtopics is not None
+            else self.get_subtopics(self.system_prompt, path, num_subtopics)
+            for path, subtopics in zip(node_paths, results, strict=True)
+        ]
+
+    async def get_subtopics_async(
+        self,
+        system_prompt: str,
+        node_path: list[str],
+        num_subtopics: int,
+        semaphore: asyncio.Semaphore,
+    ) -> list[str]:
+        """Async counterpart of get_subtopics, holding semaphore while a request is in flight."""
+        print(f"Generating {num_subtopics} subtopics for: {' -> '.join(node_path)}")
+
+        cache_key = self._subtopic_cache_key(system_prompt, node_path, num_subtopics)
+        if cache_key in self._subtopic_cache:
+            return self._subtopic_cache[cache_key]
+
+        prompt = self._build_subtopics_prompt(system_prompt, node_path, num_subtopics)
+
+        max_retries = 3
+        retries = 0
+        last_error = "No error recorded"
+
+        while retries < max_retries:
+            error = None
+            try:
+                async with semaphore:
+                    response = await litellm.acompletion(
+                        model=self.model_name,
+                        max_tokens=1000,
+                        temperature=self.temperature,
+                        messages=[{"role": "user", "content": prompt}],
+                    )
+
+                subtopics = self._parse_subtopics(
+                    response.choices[0].message.content, num_subtopics
+                )
+                if subtopics:
+                    self._cache_subtopics(cache_key, subtopics)
+                    return subtopics
 
                 last_error = "Insufficient valid subtopics generated"
                 print(f"Attempt {retries + 1}: {last_error}. Retrying...")
 
             except Exception as e:
+                error = e
                 last_error = str(e)
                 print(
                     f"Error generating subtopics (attempt {retries + 1}/{max_retries}): {last_error}"
                 )
+                if not should_retry(e):
+                    # Resending a request the provider rejected cannot help
+                    retries += 1
+                    break
 
             retries += 1
             if retries < max_retries:
-                time.sleep(2**retries)  # Exponential backoff
+                await asyncio.sleep(retry_delay(retries, error))
 
         # If all retries failed, generate default subtopics and log the failure
-        default_subtopics = [
-            f"subtopic_{i+1}_for_{node_path[-1]}" for i in range(num_subtopics)
-        ]
-        self.failed_generations.append(
-            {"path": node_path, "attempts": retries, "last_error": last_error}
-        )
-        print(
-            f"Failed to generate valid subtopics after {max_retries} attempts. Using default subtopics."
-        )
-        return default_subtopics
+        return self._default_subtopics(node_path, num_subtopics, retries, last_error)
 
     def build_subtree(
         self,
@@ -242,16 +619,7 @@ class TopicTree:
         subnodes = self.get_subtopics(system_prompt, node_path, tree_degree)
 
         # Clean and validate subnodes
-        cleaned_subnodes = []
-        for subnode in subnodes:
-            try:
-                if isinstance(subnode, dict | list):
-                    cleaned_subnodes.append(json.dumps(subnode))
-                else:
-                    cleaned_subnodes.append(str(subnode))
-            except Exception as e:
-                print(f"Error cleaning subnode: {str(e)}")
-                continue
+        cleaned_subnodes = self._clean_subnodes(subnodes)
 
         result = []
         for subnode in cleaned_subnodes:
@@ -275,16 +643,16 @@ class TopicTree:
     def save(self, save_path: str) -> None:
         """Save the topic tree to a file."""
         try:
-            with open(save_path, "w") as f:
-                for path in self.tree_paths:
-                    f.write(json.dumps({"path": path}) + "\n")
+            with open(save_path, "wb", buffering=1 << 20) as f:
+                f.writelines(json_dumps_line({"path": path}) for path in self.tree_paths)
 
             # Save failed generations if any
             if self.failed_generations:
                 failed_path = save_path.replace(".jsonl", "_failed.jsonl")
-                with open(failed_path, "w") as f:
-                    for failure in self.failed_generations:
-                        f.write(json.dumps(failure) + "\n")
+                with open(failed_path, "wb", buffering=1 << 20) as f:
+                    f.writelines(
+                        json_dumps_line(failure) for failure in self.failed_generations
+                    )
                 print(f"Failed generations saved to {failed_path}")
 
             print(f"Topic tree saved to {save_path}")
@@ -297,8 +665,7 @@ class TopicTree:
     def print_tree(self) -> None:
         """Print the topic tree in a readable format."""
         print("Topic Tree Structure:")
-        for path in self.tree_paths:
-            print(" -> ".join(path))
+        print("\n".join(" -> ".join(path) for path in self.tree_paths))
 
     def from_dict_list(self, dict_list: list[dict[str, Any]]) -> None:
         """
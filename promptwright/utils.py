@@ -1,7 +1,128 @@
 import ast
+import functools
 import json
+import random
 import re
 
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # orjson is an optional speedup, fall back to the stdlib
+    orjson = None
+
+
+def json_loads(data: str | bytes) -> Any:
+    """
+    Parse a JSON document, using orjson when it is installed.
+
+    orjson.JSONDecodeError subclasses json.JSONDecodeError, so callers can keep
+    catching the stdlib exception either way.
+
+    Args:
+        data (str | bytes): The JSON document to parse.
+
+    Returns:
+        The parsed Python object.
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def json_dumps_line(obj: Any) -> bytes:
+    """
+    Serialize an object as a single compact JSONL line.
+
+    Args:
+        obj: The object to serialize.
+
+    Returns:
+        bytes: The UTF-8 encoded JSON followed by a newline.
+    """
+    if orjson is not None:
+        return orjson.dumps(
+            obj, option=orjson.OPT_APPEND_NEWLINE | orjson.OPT_NON_STR_KEYS
+        )
+    return (json.dumps(obj, ensure_ascii=False, separators=(",", ":")) + "\n").encode()
+
+
+def extract_enclosed(text: str, open_char: str, close_char: str) -> str | None:
+    """
+    Return the span from the first open_char to the last close_char in text.
+
+    This is the span a greedy DOTALL regex like {.*} would match, but found with
+    str.find/str.rfind, so it never backtracks over the response.
+
+    Args:
+        text (str): The text to search, typically an LLM response.
+        open_char (str): The opening bracket, e.g. "{" or "[".
+        close_char (str): The closing bracket, e.g. "}" or "]".
+
+    Returns:
+        str | None: The enclosed span including both brackets, or None if there
+        is no closing bracket after the first opening one.
+    """
+    start = text.find(open_char)
+    if start == -1:
+        return None
+    end = text.rfind(close_char)
+    if end < start:
+        return None
+    return text[start : end + 1]
+
+
+# Markdown code fence markers left inside a span found by extract_enclosed
+CODE_FENCE_RE = re.compile(r"```json\s*|\s*```")
+
+
+# Prompt placeholders are written as {{{{name}}}} in prompts.py
+_PLACEHOLDER_RE = re.compile(r"\{\{\{\{(\w+)\}\}\}\}")
+
+# Apostrophes inside words, e.g. "don't", which break Python literal parsing
+_APOSTROPHE_RE = re.compile(r"(?<=\w)'(?=\w)")
+# Square brackets, for matching the extent of a list in extract_list
+_BRACKET_RE = re.compile(r"[\[\]]")
+
+
+@functools.lru_cache(maxsize=32)
+def compile_prompt_template(template: str) -> tuple[str, ...]:
+    """
+    Split a prompt template into literal text and placeholder names.
+
+    The result alternates between literal fragments (even indices) and
+    placeholder names (odd indices), so rendering is a single join rather than
+    one full scan of the template per placeholder. Results are cached, so
+    compiling the same template again is a dictionary lookup.
+
+    Args:
+        template (str): The template containing {{{{name}}}} placeholders.
+
+    Returns:
+        tuple[str, ...]: The compiled template fragments.
+    """
+    return tuple(_PLACEHOLDER_RE.split(template))
+
+
+def render_prompt_template(fragments: tuple[str, ...], values: dict[str, str]) -> str:
+    """
+    Fill a compiled prompt template with the given values.
+
+    Placeholders without a value are left in the output unchanged.
+
+    Args:
+        fragments (tuple[str, ...]): Output of compile_prompt_template.
+        values (dict[str, str]): Replacement text keyed by placeholder name.
+
+    Returns:
+        str: The rendered prompt.
+    """
+    parts = list(fragments)
+    parts[1::2] = [
+        values.get(name, f"{{{{{{{{{name}}}}}}}}}") for name in fragments[1::2]
+    ]
+    return "".join(parts)
+
 
 def extract_list(input_string: str):
     """
@@ -22,7 +143,7 @@ def extract_list(input_string: str):
         None: This function handles its own exceptions and does not raise any.
     """
     try:
-        return json.loads(input_string)
+        return json_loads(input_string)
     except json.JSONDecodeError:
         print("Failed to parse the input string as JSON.")
 
@@ -31,14 +152,12 @@ def extract_list(input_string: str):
         print("No Python list found in the input string.")
         return []
 
+    # Step from bracket to bracket rather than through every character
     count = 0
-    for i, char in enumerate(input_string[start:]):
-        if char == "[":
-            count += 1
-        elif char == "]":
-            count -= 1
+    for match in _BRACKET_RE.finditer(input_string, start):
+        count += 1 if match.group() == "[" else -1
         if count == 0:
-            end = i + start + 1
+            end = match.end()
             break
     else:
         print("No matching closing bracket found.")
@@ -67,8 +186,7 @@ def remove_linebreaks_and_spaces(input_string):
     Returns:
         str: The processed string with line breaks and extra spaces removed.
     """
-    no_linebreaks = re.sub(r"\s+", " ", input_string)
-    return " ".join(no_linebreaks.split())
+    return " ".join(input_string.split())
 
 
 def safe_literal_eval(list_string: str):
@@ -90,7 +208,7 @@ def safe_literal_eval(list_string: str):
         return ast.literal_eval(list_string)
     except (SyntaxError, ValueError):
         # Replace problematic apostrophes with the actual right single quote character
-        sanitized_string = re.sub(r"(\w)'(\w)", r"\1’\2", list_string)
+        sanitized_string = _APOSTROPHE_RE.sub("’", list_string)
         try:
             return ast.literal_eval(sanitized_string)
         except (SyntaxError, ValueError):
@@ -107,8 +225,91 @@ def read_topic_tree_from_jsonl(file_path: str) -> list[dict]:
     Returns:
         list[dict]: The topic tree.
     """
-    topic_tree = []
-    with open(file_path) as file:
-        for line in file:
-            topic_tree.append(json.loads(line.strip()))
-    return topic_tree
+    with open(file_path, "rb", buffering=1 << 20) as file:
+        return [json_loads(line) for line in file]
+
+
+MAX_RETRY_DELAY = 10
+
+
+@functools.cache
+def _provider_errors() -> tuple[tuple[type, ...], tuple[type, ...]]:
+    """
+    Return the litellm exception types that decide how a failed request is retried.
+
+    litellm is imported here rather than at the top of the module, so that the
+    Dataset class, which only needs the JSON helpers above, stays cheap to import.
+
+    Returns:
+        tuple: The transient and the permanent exception types.
+    """
+    import litellm  # noqa: PLC0415
+
+    # Raised while a provider restarts, reloads a model or sheds load; these are
+    # worth waiting out before retrying
+    transient = (
+        litellm.APIConnectionError,
+        litellm.Timeout,
+        litellm.RateLimitError,
+        litellm.ServiceUnavailableError,
+        litellm.InternalServerError,
+    )
+    # Raised when the request itself is wrong (bad credentials, an unknown model,
+    # a prompt over the context window), so resending it fails the same way
+    permanent = (
+        litellm.AuthenticationError,
+        litellm.BadRequestError,
+        litellm.NotFoundError,
+        litellm.UnprocessableEntityError,
+    )
+    return transient, permanent
+
+
+def is_transient_error(error: Exception | None) -> bool:
+    """
+    Check whether a request failed for a reason that is likely to pass.
+
+    Args:
+        error (Exception | None): The error the request failed with, if any.
+
+    Returns:
+        bool: True for provider errors such as rate limits and timeouts.
+    """
+    return isinstance(error, _provider_errors()[0])
+
+
+def should_retry(error: Exception | None) -> bool:
+    """
+    Check whether a failed request is worth sending again.
+
+    Responses that did not parse or validate, and transient provider errors,
+    can succeed on another attempt. Requests the provider rejected outright
+    cannot.
+
+    Args:
+        error (Exception | None): The error the request failed with, if any.
+
+    Returns:
+        bool: False if the provider rejected the request outright.
+    """
+    return not isinstance(error, _provider_errors()[1])
+
+
+def retry_delay(attempt: int, error: Exception | None) -> float:
+    """
+    Seconds to wait before retry attempt + 1.
+
+    Transient provider errors back off exponentially with full jitter, so
+    clients that failed together do not retry together. Anything else, such as
+    a response that did not parse, is retried immediately.
+
+    Args:
+        attempt (int): The number of the attempt that just failed, from 0.
+        error (Exception | None): The error that attempt failed with, if any.
+
+    Returns:
+        float: The delay in seconds.
+    """
+    if not is_transient_error(error):
+        return 0
+    return random.uniform(0, min(2**attempt, MAX_RETRY_DELAY))  # noqa: S311
@@ -1,14 +1,15 @@
 """Tests for the CLI module."""
 
-import os
-import tempfile
-
 from unittest.mock import Mock, patch
 
+import click
 import pytest
 
 from click.testing import CliRunner
 
+import promptwright
+import promptwright.cli
+
 from promptwright.cli import cli
 
 
@@ -18,7 +19,7 @@ def cli_runner():
     return CliRunner()
 
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def sample_yaml_content():
     """Sample YAML content for testing."""
     return """
@@ -52,7 +53,7 @@ dataset:
 """
 
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def sample_yaml_content_no_sys_msg():
     """Sample YAML content without sys_msg setting."""
     return """
@@ -85,32 +86,20 @@ dataset:
 """
 
 
-@pytest.fixture
-def sample_config_file(sample_yaml_content):
+@pytest.fixture(scope="module")
+def sample_config_file(sample_yaml_content, tmp_path_factory):
     """Create a temporary config file for testing."""
-    with tempfile.NamedTemporaryFile(mode="w", suffix=".yaml", delete=False) as f:
-        f.write(sample_yaml_content)
-        temp_path = f.name
+    config_path = tmp_path_factory.mktemp("config") / "config.yaml"
+    config_path.write_text(sample_yaml_content)
+    return str(config_path)
 
-    yield temp_path
 
-    # Cleanup
-    if os.path.exists(temp_path):
-        os.unlink(temp_path)
-
-
-@pytest.fixture
-def sample_config_file_no_sys_msg(sample_yaml_content_no_sys_msg):
+@pytest.fixture(scope="module")
+def sample_config_file_no_sys_msg(sample_yaml_content_no_sys_msg, tmp_path_factory):
     """Create a temporary config file without sys_msg setting."""
-    with tempfile.NamedTemporaryFile(mode="w", suffix=".yaml", delete=False) as f:
-        f.write(sample_yaml_content_no_sys_msg)
-        temp_path = f.name
-
-    yield temp_path
-
-    # Cleanup
-    if os.path.exists(temp_path):
-        os.unlink(temp_path)
+    config_path = tmp_path_factory.mktemp("config") / "config.yaml"
+    config_path.write_text(sample_yaml_content_no_sys_msg)
+    return str(config_path)
 
 
 def test_cli_help(cli_runner):
@@ -120,6 +109,16 @@ def test_cli_help(cli_runner):
     assert "PromptWright CLI" in result.output
 
 
+def test_package_cli_is_the_command():
+    """The package exports the click group even after promptwright.cli is imported."""
+    assert isinstance(promptwright.cli, click.Group)
+    assert promptwright.cli is cli
+
+    from promptwright import cli as package_cli  # noqa: PLC0415
+
+    assert package_cli is cli
+
+
 def test_start_help(cli_runner):
     """Test start command help."""
     result = cli_runner.invoke(cli, ["start", "--help"])
@@ -144,7 +143,9 @@ def test_start_command_basic(
     mock_engine_instance.create_data.return_value = mock_dataset
 
     # Run command
-    result = cli_runner.invoke(cli, ["start", sample_config_file])
+    result = cli_runner.invoke(
+        cli, ["start", sample_config_file], catch_exceptions=False
+    )
 
     # Verify command executed successfully
     assert result.exit_code == 0
@@ -182,6 +183,7 @@ def test_start_command_with_sys_msg_override(
             "--sys-msg",
             "false",
         ],
+        catch_exceptions=False,
     )
 
     # Verify command executed successfully
@@ -208,7 +210,9 @@ def test_start_command_default_sys_msg(
     mock_engine_instance.create_data.return_value = mock_dataset
 
     # Run command without sys_msg override
-    result = cli_runner.invoke(cli, ["start", sample_config_file_no_sys_msg])
+    result = cli_runner.invoke(
+        cli, ["start", sample_config_file_no_sys_msg], catch_exceptions=False
+    )
 
     # Verify command executed successfully
     assert result.exit_code == 0
@@ -260,6 +264,7 @@ def test_start_command_with_overrides(
             "--sys-msg",
             "false",
         ],
+        catch_exceptions=False,
     )
 
     # Verify command executed successfully
@@ -288,7 +293,7 @@ def test_start_command_with_overrides(
 
 def test_start_command_with_jsonl(
     mock_data_engine, mock_topic_tree, mock_read_topic_tree_from_jsonl, cli_runner,
-    sample_config_file
+    sample_config_file, tmp_path
     ):
     """Test start command with JSONL file."""
     mock_tree_instance = Mock()
@@ -300,42 +305,37 @@ def test_start_command_with_jsonl(
     mock_dataset = Mock()
     mock_engine_instance.create_data.return_value = mock_dataset
     # Create a temporary JSONL file
-    with tempfile.NamedTemporaryFile(mode="w", suffix=".jsonl", delete=False) as f:
-        f.write('{"path": ["root", "child"]}\n')
-        temp_jsonl_path = f.name
-
-    try:
-        # Run command with JSONL file
-        result = cli_runner.invoke(
-            cli,
-            [
-                "start",
-                sample_config_file,
-                "--topic-tree-jsonl",
-                temp_jsonl_path
-            ],
-        )
-
-        # Print output if command fails
-        if result.exit_code != 0:
-            print(result.output)
-
-        # Verify command executed successfully
-        assert result.exit_code == 0
-
-        # Verify JSONL read function was called
-        mock_read_topic_tree_from_jsonl.assert_called_once_with(temp_jsonl_path)
-
-        # Verify from_dict_list was called with the correct data
-        mock_tree_instance.from_dict_list.assert_called_once_with([{"path": ["root", "child"]}])
-
-        # Verify save was not called since JSONL file was provided
-        mock_tree_instance.save.assert_not_called()
-
-    finally:
-        # Cleanup the temporary JSONL file
-        if os.path.exists(temp_jsonl_path):
-            os.unlink(temp_jsonl_path)
+    jsonl_path = tmp_path / "tree.jsonl"
+    jsonl_path.write_text('{"path": ["root", "child"]}\n')
+    temp_jsonl_path = str(jsonl_path)
+
+    # Run command with JSONL file
+    result = cli_runner.invoke(
+        cli,
+        [
+            "start",
+            sample_config_file,
+            "--topic-tree-jsonl",
+            temp_jsonl_path
+        ],
+        catch_exceptions=False,
+    )
+
+    # Print output if command fails
+    if result.exit_code != 0:
+        print(result.output)
+
+    # Verify command executed successfully
+    assert result.exit_code == 0
+
+    # Verify JSONL read function was called
+    mock_read_topic_tree_from_jsonl.assert_called_once_with(temp_jsonl_path)
+
+    # Verify from_dict_list was called with the correct data
+    mock_tree_instance.from_dict_list.assert_called_once_with([{"path": ["root", "child"]}])
+
+    # Verify save was not called since JSONL file was provided
+    mock_tree_instance.save.assert_not_called()
 
 def test_start_command_missing_config(cli_runner):
     """Test start command with missing config file."""
@@ -344,19 +344,14 @@ def test_start_command_missing_config(cli_runner):
     assert "Error" in result.output
 
 
-def test_start_command_invalid_yaml(cli_runner):
+def test_start_command_invalid_yaml(cli_runner, tmp_path):
     """Test start command with invalid YAML file."""
-    with tempfile.NamedTemporaryFile(mode="w", suffix=".yaml", delete=False) as f:
-        f.write("invalid: yaml: content:")
-        temp_path = f.name
-
-    try:
-        result = cli_runner.invoke(cli, ["start", temp_path])
-        assert result.exit_code != 0
-        assert "Error" in result.output
-    finally:
-        if os.path.exists(temp_path):
-            os.unlink(temp_path)
+    config_path = tmp_path / "config.yaml"
+    config_path.write_text("invalid: yaml: content:")
+
+    result = cli_runner.invoke(cli, ["start", str(config_path)])
+    assert result.exit_code != 0
+    assert "Error" in result.output
 
 
 @patch("promptwright.cli.TopicTree")
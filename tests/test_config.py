@@ -1,8 +1,5 @@
 """Tests for the configuration module."""
 
-import os
-import tempfile
-
 import pytest
 import yaml
 
@@ -91,31 +88,19 @@ def sample_config_dict_no_sys_msg():
 
 
 @pytest.fixture
-def sample_yaml_file(sample_config_dict):
+def sample_yaml_file(sample_config_dict, tmp_path):
     """Create a temporary YAML file with sample configuration."""
-    with tempfile.NamedTemporaryFile(mode="w", suffix=".yaml", delete=False) as f:
-        yaml.dump(sample_config_dict, f)
-        temp_path = f.name
-
-    yield temp_path
-
-    # Cleanup
-    if os.path.exists(temp_path):
-        os.unlink(temp_path)
+    config_path = tmp_path / "config.yaml"
+    config_path.write_text(yaml.dump(sample_config_dict))
+    return str(config_path)
 
 
 @pytest.fixture
-def sample_yaml_file_no_sys_msg(sample_config_dict_no_sys_msg):
+def sample_yaml_file_no_sys_msg(sample_config_dict_no_sys_msg, tmp_path):
     """Create a temporary YAML file without sys_msg setting."""
-    with tempfile.NamedTemporaryFile(mode="w", suffix=".yaml", delete=False) as f:
-        yaml.dump(sample_config_dict_no_sys_msg, f)
-        temp_path = f.name
-
-    yield temp_path
-
-    # Cleanup
-    if os.path.exists(temp_path):
-        os.unlink(temp_path)
+    config_path = tmp_path / "config.yaml"
+    config_path.write_text(yaml.dump(sample_config_dict_no_sys_msg))
+    return str(config_path)
 
 
 def test_load_from_yaml(sample_yaml_file, sample_config_dict):
@@ -154,6 +139,20 @@ def test_get_engine_args(sample_yaml_file):
     assert args.temperature == 0.9  # noqa: PLR2004
     assert args.max_retries == 2  # noqa: PLR2004
     assert args.sys_msg is True  # Default from dataset config
+    assert args.model_hosts is None
+    assert args.max_concurrency is None
+
+
+def test_max_concurrency_from_config(sample_config_dict, tmp_path):
+    """Test that max_concurrency is read for both the tree and the engine."""
+    sample_config_dict["topic_tree"]["args"]["max_concurrency"] = 8
+    sample_config_dict["data_engine"]["args"]["max_concurrency"] = 16
+    config_path = tmp_path / "config.yaml"
+    config_path.write_text(yaml.dump(sample_config_dict))
+    config = PromptWrightConfig.from_yaml(str(config_path))
+
+    assert config.get_topic_tree_args().max_concurrency == 8  # noqa: PLR2004
+    assert config.get_engine_args().max_concurrency == 16  # noqa: PLR2004
 
 
 def test_get_engine_args_no_sys_msg(sample_yaml_file_no_sys_msg):
@@ -214,15 +213,10 @@ def test_missing_yaml_file():
         PromptWrightConfig.from_yaml("nonexistent.yaml")
 
 
-def test_invalid_yaml_content():
+def test_invalid_yaml_content(tmp_path):
     """Test handling of invalid YAML content."""
-    with tempfile.NamedTemporaryFile(mode="w", suffix=".yaml", delete=False) as f:
-        f.write("invalid: yaml: content:")
-        temp_path = f.name
-
-    try:
-        with pytest.raises(yaml.YAMLError):
-            PromptWrightConfig.from_yaml(temp_path)
-    finally:
-        if os.path.exists(temp_path):
-            os.unlink(temp_path)
+    config_path = tmp_path / "config.yaml"
+    config_path.write_text("invalid: yaml: content:")
+
+    with pytest.raises(yaml.YAMLError):
+        PromptWrightConfig.from_yaml(str(config_path))
@@ -1,99 +1,46 @@
+import pytest
+
+from promptwright import Dataset
+
+
 def test_dataset_initialization():
     """Test Dataset class initialization."""
-    from promptwright import Dataset
-
     dataset = Dataset()
     assert len(dataset) == 0
     assert dataset.samples == []
 
 
-def test_dataset_validation():
+def _sample(*roles):
+    return {"messages": [{"role": role, "content": "test"} for role in roles]}
+
+
+@pytest.mark.parametrize(
+    ("sample", "expected"),
+    [
+        pytest.param(_sample("user", "assistant"), True, id="user_assistant"),
+        pytest.param(
+            {"messages": [{"role": "invalid", "content": "test"}]},
+            False,
+            id="invalid_role",
+        ),
+        # System messages are valid in any position, and more than once
+        pytest.param(_sample("system", "user", "assistant"), True, id="system_first"),
+        pytest.param(_sample("user", "system", "assistant"), True, id="system_middle"),
+        pytest.param(_sample("user", "assistant", "system"), True, id="system_last"),
+        pytest.param(
+            _sample("system", "system", "user", "assistant"),
+            True,
+            id="multiple_system",
+        ),
+    ],
+)
+def test_dataset_validation(sample, expected):
     """Test sample validation."""
-    from promptwright import Dataset
-
-    valid_sample = {
-        "messages": [
-            {"role": "user", "content": "test"},
-            {"role": "assistant", "content": "response"},
-        ]
-    }
-
-    invalid_sample = {"messages": [{"role": "invalid", "content": "test"}]}
-
-    assert Dataset.validate_sample(valid_sample) is True
-    assert Dataset.validate_sample(invalid_sample) is False
-
-
-def test_dataset_validation_with_system_message():
-    """Test sample validation with system message."""
-    from promptwright import Dataset
-
-    valid_sample = {
-        "messages": [
-            {"role": "system", "content": "system prompt"},
-            {"role": "user", "content": "test"},
-            {"role": "assistant", "content": "response"},
-        ]
-    }
-
-    assert Dataset.validate_sample(valid_sample) is True
-
-
-def test_dataset_validation_system_message_order():
-    """Test sample validation with system message in different positions."""
-    from promptwright import Dataset
-
-    # System message should be valid in any position
-    valid_sample_start = {
-        "messages": [
-            {"role": "system", "content": "system prompt"},
-            {"role": "user", "content": "test"},
-            {"role": "assistant", "content": "response"},
-        ]
-    }
-
-    valid_sample_middle = {
-        "messages": [
-            {"role": "user", "content": "test"},
-            {"role": "system", "content": "system prompt"},
-            {"role": "assistant", "content": "response"},
-        ]
-    }
-
-    valid_sample_end = {
-        "messages": [
-            {"role": "user", "content": "test"},
-            {"role": "assistant", "content": "response"},
-            {"role": "system", "content": "system prompt"},
-        ]
-    }
-
-    assert Dataset.validate_sample(valid_sample_start) is True
-    assert Dataset.validate_sample(valid_sample_middle) is True
-    assert Dataset.validate_sample(valid_sample_end) is True
-
-
-def test_dataset_validation_multiple_system_messages():
-    """Test sample validation with multiple system messages."""
-    from promptwright import Dataset
-
-    # Multiple system messages should be valid
-    valid_sample = {
-        "messages": [
-            {"role": "system", "content": "system prompt 1"},
-            {"role": "system", "content": "system prompt 2"},
-            {"role": "user", "content": "test"},
-            {"role": "assistant", "content": "response"},
-        ]
-    }
-
-    assert Dataset.validate_sample(valid_sample) is True
+    assert Dataset.validate_sample(sample) is expected
 
 
 def test_dataset_add_samples():
     """Test adding samples to dataset."""
-    from promptwright import Dataset
-
     dataset = Dataset()
 
     samples = [
@@ -118,8 +65,6 @@ def test_dataset_add_samples():
 
 def test_dataset_add_samples_with_system_messages():
     """Test adding samples with system messages to dataset."""
-    from promptwright import Dataset
-
     dataset = Dataset()
 
     samples = [
@@ -147,8 +92,6 @@ def test_dataset_add_samples_with_system_messages():
 
 def test_dataset_filter_by_role():
     """Test filtering samples by role."""
-    from promptwright import Dataset
-
     dataset = Dataset()
 
     samples = [
@@ -173,8 +116,6 @@ def test_dataset_filter_by_role():
 
 def test_dataset_get_statistics():
     """Test getting dataset statistics."""
-    from promptwright import Dataset
-
     dataset = Dataset()
 
     samples = [
@@ -194,3 +135,19 @@ def test_dataset_get_statistics():
     assert stats["avg_messages_per_sample"] == 3  # noqa: PLR2004
     assert "system" in stats["role_distribution"]
     assert stats["role_distribution"]["system"] == 1 / 3  # noqa: PLR2004
+
+
+def test_dataset_save_round_trip(tmp_path):
+    sample = {
+        "messages": [
+            {"role": "user", "content": "Line one\nLine two"},
+            {"role": "assistant", "content": "Café  au lait"},
+        ]
+    }
+    dataset = Dataset.from_list([sample, sample])
+    save_path = tmp_path / "dataset.jsonl"
+
+    dataset.save(str(save_path))
+
+    assert len(save_path.read_text(encoding="utf-8").splitlines()) == 2  # noqa: PLR2004
+    assert Dataset.from_jsonl(str(save_path)).samples == [sample, sample]
@@ -1,8 +1,18 @@
-from unittest.mock import MagicMock, patch
+import asyncio
+import json
 
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import litellm
 import pytest
 
-from promptwright.engine import DataEngine, Dataset, EngineArguments
+from promptwright.engine import (
+    DataEngine,
+    Dataset,
+    EngineArguments,
+    validate_json_response,
+)
+from promptwright.prompts import SAMPLE_GENERATION_PROMPT
 
 
 @pytest.fixture
@@ -75,6 +85,30 @@ def test_create_data_success(mock_batch_completion, data_engine):
 
     # Assert that the dataset contains exactly the expected number of samples
     assert len(dataset.samples) == expected_num_samples
+    # The whole batch is sent in a single call with one worker per prompt
+    mock_batch_completion.assert_called_once()
+    assert mock_batch_completion.call_args.kwargs["max_workers"] == expected_num_samples
+
+
+@patch("promptwright.engine.litellm.batch_completion")
+def test_create_data_respects_max_concurrency(mock_batch_completion, engine_args):
+    engine_args.max_concurrency = 2
+    engine = DataEngine(engine_args)
+    mock_batch_completion.return_value = [
+        MagicMock(
+            choices=[
+                MagicMock(
+                    message=MagicMock(
+                        content='{"messages": [{"role": "user", "content": "example"}, {"role": "assistant", "content": "response"}]}'
+                    )
+                )
+            ]
+        )
+    ] * 5
+
+    engine.create_data(num_steps=1, batch_size=5)
+
+    assert mock_batch_completion.call_args.kwargs["max_workers"] == 2  # noqa: PLR2004
 
 
 @patch("promptwright.engine.litellm.batch_completion")
@@ -136,6 +170,33 @@ def test_create_data_without_sys_msg(mock_batch_completion, data_engine):
     assert dataset.samples[0]["messages"][0]["role"] == "user"
 
 
+@patch("promptwright.engine.litellm.batch_completion")
+def test_create_data_replaces_model_sys_msg(mock_batch_completion, data_engine):
+    # Model response already leads with a system message
+    mock_batch_completion.return_value = [
+        MagicMock(
+            choices=[
+                MagicMock(
+                    message=MagicMock(
+                        content='{"messages": [{"role": "system", "content": "sys"}, {"role": "user", "content": "example"}, {"role": "assistant", "content": "response"}]}'
+                    )
+                )
+            ]
+        )
+    ]
+
+    topic_tree = MagicMock()
+    topic_tree.tree_paths = ["path1"]
+
+    dataset = data_engine.create_data(num_steps=1, batch_size=1, topic_tree=topic_tree)
+
+    # The model's system message is replaced by the configured one, not duplicated
+    messages = dataset.samples[0]["messages"]
+    assert len(messages) == 3  # noqa: PLR2004
+    assert [m["role"] for m in messages].count("system") == 1
+    assert messages[0]["content"] == data_engine.args.system_prompt
+
+
 @patch("promptwright.engine.litellm.batch_completion")
 def test_create_data_sys_msg_override(mock_batch_completion):
     # Create engine with sys_msg=False
@@ -174,6 +235,79 @@ def test_create_data_sys_msg_override(mock_batch_completion):
     assert dataset.samples[0]["messages"][0]["role"] == "system"
 
 
+@patch("promptwright.engine.litellm.batch_completion")
+def test_create_data_stream_to(mock_batch_completion, data_engine, tmp_path):
+    mock_batch_completion.return_value = [
+        MagicMock(
+            choices=[
+                MagicMock(
+                    message=MagicMock(
+                        content='{"messages": [{"role": "user", "content": "example"}, {"role": "assistant", "content": "response"}]}'
+                    )
+                )
+            ]
+        )
+    ] * 2
+
+    topic_tree = MagicMock()
+    topic_tree.tree_paths = ["path1", "path2"]
+    stream_path = tmp_path / "stream.jsonl"
+
+    dataset = data_engine.create_data(
+        num_steps=1, batch_size=2, topic_tree=topic_tree, stream_to=str(stream_path)
+    )
+
+    lines = stream_path.read_text().splitlines()
+    assert len(lines) == len(dataset.samples) == 2  # noqa: PLR2004
+    assert json.loads(lines[0]) == dataset.samples[0]
+
+
+@patch("promptwright.engine.litellm.acompletion", new_callable=AsyncMock)
+def test_create_data_async_success(mock_acompletion, data_engine):
+    mock_acompletion.return_value = MagicMock(
+        choices=[
+            MagicMock(
+                message=MagicMock(
+                    content='{"messages": [{"role": "user", "content": "example"}, {"role": "assistant", "content": "response"}]}'
+                )
+            )
+        ]
+    )
+
+    topic_tree = MagicMock()
+    topic_tree.tree_paths = [f"path{i}" for i in range(1, 7)]
+
+    dataset = asyncio.run(
+        data_engine.create_data_async(
+            num_steps=2, batch_size=3, topic_tree=topic_tree, max_concurrency=2
+        )
+    )
+
+    expected_num_samples = 6
+    assert mock_acompletion.await_count == expected_num_samples
+    assert len(dataset.samples) == expected_num_samples
+    assert dataset.samples[0]["messages"][0]["role"] == "system"
+
+
+@patch("promptwright.engine.litellm.acompletion", new_callable=AsyncMock)
+def test_create_data_async_retries_failed_prompt(mock_acompletion, data_engine):
+    valid_response = MagicMock(
+        choices=[
+            MagicMock(
+                message=MagicMock(
+                    content='{"messages": [{"role": "user", "content": "example"}, {"role": "assistant", "content": "response"}]}'
+                )
+            )
+        ]
+    )
+    mock_acompletion.side_effect = [Exception("connection reset"), valid_response]
+
+    dataset = asyncio.run(data_engine.create_data_async(num_steps=1, batch_size=1))
+
+    assert mock_acompletion.await_count == 2  # noqa: PLR2004
+    assert len(dataset.samples) == 1
+
+
 def test_build_prompt(data_engine):
     prompt = data_engine.build_prompt("Test prompt", 3, ["subtopic1", "subtopic2"])
     assert "{{system_prompt}}" not in prompt
@@ -182,6 +316,16 @@ def test_build_prompt(data_engine):
     assert "{{subtopics}}" not in prompt
 
 
+def test_build_prompt_fills_sample_template(data_engine):
+    prompt = data_engine.build_prompt(
+        SAMPLE_GENERATION_PROMPT, 0, ["subtopic1", "subtopic2"]
+    )
+    assert "{{{{" not in prompt
+    assert data_engine.args.system_prompt in prompt
+    assert data_engine.args.instructions in prompt
+    assert "subtopic1 -> subtopic2" in prompt
+
+
 def test_build_system_prompt(data_engine):
     system_prompt = data_engine.build_system_prompt()
     assert system_prompt == data_engine.args.system_prompt
@@ -198,6 +342,32 @@ def test_build_examples_text_no_examples(data_engine):
     assert examples_text == ""
 
 
+def test_build_examples_text():
+    sample = {
+        "messages": [
+            {"role": "user", "content": "example"},
+            {"role": "assistant", "content": "response"},
+        ]
+    }
+    engine = DataEngine(
+        EngineArguments(
+            instructions="Test instructions",
+            system_prompt="Test system prompt",
+            model_name="test-model",
+            example_data=Dataset.from_list([sample, sample]),
+        )
+    )
+
+    examples_text = engine.build_examples_text(3)
+
+    assert examples_text.count("Here are output examples:") == 1
+    assert "Example 1:" in examples_text
+    assert "Example 2:" in examples_text
+    # Only two examples are available, so no third is requested
+    assert "Example 3:" not in examples_text
+    assert str(sample) in examples_text
+
+
 def test_build_subtopics_text(data_engine):
     subtopics_text = data_engine.build_subtopics_text(["subtopic1", "subtopic2"])
     assert "subtopic1 -> subtopic2" in subtopics_text
@@ -207,3 +377,216 @@ def test_build_subtopics_text(data_engine):
 def test_save_dataset(mock_save, data_engine):
     data_engine.save_dataset("test_path.jsonl")
     mock_save.assert_called_once_with("test_path.jsonl")
+
+
+@patch("promptwright.engine.asyncio.sleep", new_callable=AsyncMock)
+@patch("promptwright.engine.litellm.acompletion", new_callable=AsyncMock)
+def test_create_data_async_backs_off_on_transient_error(
+    mock_acompletion, mock_sleep, data_engine
+):
+    valid_response = MagicMock(
+        choices=[
+            MagicMock(
+                message=MagicMock(
+                    content='{"messages": [{"role": "user", "content": "example"}, {"role": "assistant", "content": "response"}]}'
+                )
+            )
+        ]
+    )
+    mock_acompletion.side_effect = [
+        litellm.APIConnectionError(
+            message="connection refused", llm_provider="ollama", model="mistral"
+        ),
+        valid_response,
+    ]
+
+    dataset = asyncio.run(data_engine.create_data_async(num_steps=1, batch_size=1))
+
+    assert len(dataset.samples) == 1
+    mock_sleep.assert_awaited_once()
+    assert 0 <= mock_sleep.await_args.args[0] <= 1
+
+
+@patch.object(Dataset, "save")
+@patch("promptwright.engine.litellm.acompletion", new_callable=AsyncMock)
+def test_create_data_async_propagates_cancellation(
+    mock_acompletion, mock_save, data_engine
+):
+    async def never_respond(**kwargs):  # noqa: ARG001
+        await asyncio.Event().wait()
+
+    mock_acompletion.side_effect = never_respond
+
+    async def run():
+        async with asyncio.timeout(0.05):
+            await data_engine.create_data_async(num_steps=1, batch_size=2)
+
+    with pytest.raises(TimeoutError):
+        asyncio.run(run())
+    # The partial dataset is still kept
+    mock_save.assert_called_once_with("interrupted_dataset.jsonl")
+
+
+@patch("promptwright.engine.litellm.acompletion", new_callable=AsyncMock)
+def test_create_data_async_round_robins_model_hosts(mock_acompletion):
+    hosts = ["http://localhost:11434", "http://localhost:11435"]
+    engine = DataEngine(
+        EngineArguments(
+            instructions="Test instructions",
+            system_prompt="Test system prompt",
+            model_name="ollama/mistral",
+            model_hosts=hosts,
+        )
+    )
+    mock_acompletion.return_value = MagicMock(
+        choices=[
+            MagicMock(
+                message=MagicMock(
+                    content='{"messages": [{"role": "user", "content": "example"}, {"role": "assistant", "content": "response"}]}'
+                )
+            )
+        ]
+    )
+
+    asyncio.run(engine.create_data_async(num_steps=2, batch_size=2))
+
+    api_bases = [call.kwargs["api_base"] for call in mock_acompletion.await_args_list]
+    assert api_bases == hosts * 2
+
+
+@patch("promptwright.engine.litellm.batch_completion")
+def test_create_data_splits_batches_across_model_hosts(mock_batch_completion):
+    hosts = ["http://localhost:11434", "http://localhost:11435"]
+    engine = DataEngine(
+        EngineArguments(
+            instructions="Test instructions",
+            system_prompt="Test system prompt",
+            model_name="ollama/mistral",
+            model_hosts=hosts,
+        )
+    )
+    response = MagicMock(
+        choices=[
+            MagicMock(
+                message=MagicMock(
+                    content='{"messages": [{"role": "user", "content": "example"}, {"role": "assistant", "content": "response"}]}'
+                )
+            )
+        ]
+    )
+    mock_batch_completion.side_effect = lambda messages, **kwargs: [  # noqa: ARG005
+        response
+    ] * len(messages)
+
+    dataset = engine.create_data(num_steps=1, batch_size=4)
+
+    assert len(dataset.samples) == 4  # noqa: PLR2004
+    # Each host gets its own share of the step
+    calls = mock_batch_completion.call_args_list
+    assert sorted(call.kwargs["api_base"] for call in calls) == hosts
+    assert [len(call.kwargs["messages"]) for call in calls] == [2, 2]
+
+
+@patch("promptwright.engine.litellm.batch_completion")
+def test_create_data_max_concurrency_spans_all_model_hosts(mock_batch_completion):
+    engine = DataEngine(
+        EngineArguments(
+            instructions="Test instructions",
+            system_prompt="Test system prompt",
+            model_name="ollama/mistral",
+            model_hosts=[f"http://localhost:{port}" for port in range(11434, 11439)],
+            max_concurrency=4,
+        )
+    )
+    response = MagicMock(
+        choices=[
+            MagicMock(
+                message=MagicMock(
+                    content='{"messages": [{"role": "user", "content": "example"}, {"role": "assistant", "content": "response"}]}'
+                )
+            )
+        ]
+    )
+    mock_batch_completion.side_effect = lambda messages, **kwargs: [  # noqa: ARG005
+        response
+    ] * len(messages)
+
+    dataset = engine.create_data(num_steps=1, batch_size=8)
+
+    assert len(dataset.samples) == 8  # noqa: PLR2004
+    # Five hosts but a limit of four: only four hosts share the step
+    calls = mock_batch_completion.call_args_list
+    assert len(calls) == 4  # noqa: PLR2004
+    assert sum(call.kwargs["max_workers"] for call in calls) == 4  # noqa: PLR2004
+
+
+@pytest.mark.parametrize(
+    "response_text",
+    [
+        '{"messages": []}',
+        '\n{"messages": []}  ',
+        'Sure!\n```json\n{"messages": []}\n```',
+    ],
+)
+def test_validate_json_response(response_text):
+    assert validate_json_response(response_text) == {"messages": []}
+
+
+def test_validate_json_response_rejects_non_json():
+    assert validate_json_response("{not json}") is None
+    assert validate_json_response("no object here") is None
+
+
+@patch("promptwright.engine.litellm.batch_completion")
+def test_create_data_retries_only_failed_prompts(mock_batch_completion, data_engine):
+    valid_response = MagicMock(
+        choices=[
+            MagicMock(
+                message=MagicMock(
+                    content='{"messages": [{"role": "user", "content": "example"}, {"role": "assistant", "content": "response"}]}'
+                )
+            )
+        ]
+    )
+    mock_batch_completion.side_effect = [
+        [valid_response, Exception("connection reset"), valid_response],
+        [valid_response],
+    ]
+
+    dataset = data_engine.create_data(num_steps=1, batch_size=3)
+
+    assert len(dataset.samples) == 3  # noqa: PLR2004
+    assert mock_batch_completion.call_count == 2  # noqa: PLR2004
+    retried_messages = mock_batch_completion.call_args_list[1].kwargs["messages"]
+    assert len(retried_messages) == 1
+    assert not data_engine.failed_samples
+
+
+@patch("promptwright.engine.litellm.batch_completion")
+def test_create_data_does_not_retry_rejected_requests(
+    mock_batch_completion, data_engine
+):
+    mock_batch_completion.return_value = [
+        litellm.AuthenticationError(
+            message="invalid api key", llm_provider="openai", model="gpt-4"
+        )
+    ]
+
+    dataset = data_engine.create_data(num_steps=1, batch_size=1)
+
+    assert len(dataset.samples) == 0
+    mock_batch_completion.assert_called_once()
+    assert len(data_engine.failed_samples) == 1
+
+
+def test_summarize_failures_truncates_examples(data_engine):
+    data_engine.failed_samples = ["x" * 300, "short"]
+    data_engine.failure_analysis["json_parsing_errors"] = ["x" * 300, "short"]
+
+    summary = data_engine.summarize_failures()
+
+    assert summary["total_failures"] == 2  # noqa: PLR2004
+    assert summary["failure_examples"]["json_parsing_errors"] == [
+        "x" * 200 + "...",
+        "short",
+    ]
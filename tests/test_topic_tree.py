@@ -0,0 +1,325 @@
+import asyncio
+
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import litellm
+import pytest
+
+from promptwright.topic_tree import (
+    TopicTree,
+    TopicTreeArguments,
+    validate_and_clean_response,
+)
+from promptwright.utils import read_topic_tree_from_jsonl
+
+
+@pytest.fixture
+def topic_tree():
+    return TopicTree(
+        TopicTreeArguments(
+            root_prompt="Root",
+            model_system_prompt="Test system prompt",
+            tree_degree=2,
+            tree_depth=2,
+            model_name="test-model",
+        )
+    )
+
+
+def make_response(content):
+    return MagicMock(choices=[MagicMock(message=MagicMock(content=content))])
+
+
+@patch("promptwright.topic_tree.litellm.acompletion", new_callable=AsyncMock)
+def test_build_tree_async(mock_acompletion, topic_tree):
+    mock_acompletion.return_value = make_response('["a", "b"]')
+
+    asyncio.run(topic_tree.build_tree_async(max_concurrency=2))
+
+    # One request for the root plus one per node on the first level
+    assert mock_acompletion.await_count == 3  # noqa: PLR2004
+    assert topic_tree.tree_paths == [
+        ["Root", "a", "a"],
+        ["Root", "a", "b"],
+        ["Root", "b", "a"],
+        ["Root", "b", "b"],
+    ]
+
+
+@patch("promptwright.topic_tree.litellm.acompletion", new_callable=AsyncMock)
+def test_build_tree_async_does_not_wait_for_slow_siblings(mock_acompletion):
+    tree = TopicTree(
+        TopicTreeArguments(
+            root_prompt="Root",
+            model_system_prompt="Test system prompt",
+            tree_degree=2,
+            tree_depth=3,
+            model_name="test-model",
+        )
+    )
+    grandchild_started = asyncio.Event()
+
+    async def respond(messages, **kwargs):  # noqa: ARG001
+        prompt = messages[0]["content"]
+        if "node path: Root -> b -> a\n" in prompt:
+            grandchild_started.set()
+        if "node path: Root -> a\n" in prompt:
+            # Only finishes once b's subtree has moved on without it
+            await asyncio.wait_for(grandchild_started.wait(), timeout=1)
+        return make_response('["a", "b"]')
+
+    mock_acompletion.side_effect = respond
+
+    asyncio.run(tree.build_tree_async())
+
+    assert len(tree.tree_paths) == 8  # noqa: PLR2004
+    assert tree.tree_paths[0] == ["Root", "a", "a", "a"]
+    assert tree.tree_paths[-1] == ["Root", "b", "b", "b"]
+
+
+@patch("promptwright.topic_tree.asyncio.sleep", new_callable=AsyncMock)
+@patch("promptwright.topic_tree.litellm.acompletion", new_callable=AsyncMock)
+def test_build_tree_async_uses_defaults_on_failure(
+    mock_acompletion, mock_sleep, topic_tree  # noqa: ARG001
+):
+    mock_acompletion.return_value = make_response("not a list")
+
+    asyncio.run(topic_tree.build_tree_async())
+
+    assert len(topic_tree.tree_paths) == 4  # noqa: PLR2004
+    assert topic_tree.tree_paths[0] == [
+        "Root",
+        "subtopic_1_for_Root",
+        "subtopic_1_for_subtopic_1_for_Root",
+    ]
+    assert len(topic_tree.failed_generations) == 3  # noqa: PLR2004
+
+
+@patch("promptwright.topic_tree.litellm.completion")
+def test_build_tree(mock_completion, topic_tree):
+    mock_completion.return_value = make_response('["a", "b"]')
+
+    topic_tree.build_tree(max_concurrency=2)
+
+    assert mock_completion.call_count == 3  # noqa: PLR2004
+    assert topic_tree.tree_paths == [
+        ["Root", "a", "a"],
+        ["Root", "a", "b"],
+        ["Root", "b", "a"],
+        ["Root", "b", "b"],
+    ]
+
+
+@patch("promptwright.topic_tree.litellm.completion")
+def test_build_tree_reuses_cached_subtopics(mock_completion, tmp_path):
+    mock_completion.return_value = make_response('["a", "b"]')
+    args = TopicTreeArguments(
+        root_prompt="Root",
+        tree_degree=2,
+        tree_depth=2,
+        model_name="test-model",
+        cache_path=str(tmp_path / "subtopics.jsonl"),
+    )
+
+    first = TopicTree(args)
+    first.build_tree()
+    second = TopicTree(args)
+    second.build_tree()
+
+    assert mock_completion.call_count == 3  # noqa: PLR2004
+    assert second.tree_paths == first.tree_paths
+
+
+@patch("promptwright.topic_tree.litellm.completion")
+def test_build_tree_skips_truncated_cache_line(mock_completion, tmp_path):
+    mock_completion.return_value = make_response('["a", "b"]')
+    cache_path = tmp_path / "subtopics.jsonl"
+    args = TopicTreeArguments(
+        root_prompt="Root",
+        tree_degree=2,
+        tree_depth=2,
+        model_name="test-model",
+        cache_path=str(cache_path),
+    )
+    TopicTree(args).build_tree()
+    # Cut the last entry off mid-line, as a killed run would
+    lines = cache_path.read_bytes().splitlines(keepends=True)
+    cache_path.write_bytes(b"".join(lines[:-1]) + lines[-1][:10])
+
+    resumed = TopicTree(args)
+    resumed.build_tree()
+    # Only the truncated entry is requested again and written on its own line
+    assert mock_completion.call_count == 4  # noqa: PLR2004
+    TopicTree(args).build_tree()
+    assert mock_completion.call_count == 4  # noqa: PLR2004
+    assert len(cache_path.read_bytes().splitlines()) == 4  # noqa: PLR2004
+
+
+@pytest.mark.parametrize(
+    ("batch_response", "expected_calls"),
+    [
+        ('{"0": ["a", "b"], "1": ["c", "d"]}', 2),
+        # Nodes missing from the batched response fall back to their own request
+        ('{"0": ["a", "b"]}', 3),
+    ],
+)
+@patch("promptwright.topic_tree.litellm.completion")
+def test_build_tree_batches_sibling_nodes(
+    mock_completion, batch_response, expected_calls
+):
+    def respond(messages, **kwargs):  # noqa: ARG001
+        prompt = messages[0]["content"]
+        if "node paths:" in prompt:
+            return make_response(batch_response)
+        return make_response('["c", "d"]' if "-> b" in prompt else '["a", "b"]')
+
+    mock_completion.side_effect = respond
+    tree = TopicTree(
+        TopicTreeArguments(
+            root_prompt="Root",
+            tree_degree=2,
+            tree_depth=2,
+            model_name="test-model",
+            subtopic_batch_size=2,
+        )
+    )
+
+    tree.build_tree()
+
+    assert mock_completion.call_count == expected_calls
+    assert tree.tree_paths == [
+        ["Root", "a", "a"],
+        ["Root", "a", "b"],
+        ["Root", "b", "c"],
+        ["Root", "b", "d"],
+    ]
+
+
+@pytest.mark.parametrize("batch_size", [0, 9])
+def test_subtopic_batch_size_is_validated(batch_size):
+    with pytest.raises(ValueError, match="subtopic_batch_size"):
+        TopicTreeArguments(root_prompt="Root", subtopic_batch_size=batch_size)
+
+
+@patch("promptwright.topic_tree.time.sleep")
+@patch("promptwright.topic_tree.litellm.completion")
+def test_get_subtopics_batch_backs_off_on_transient_errors(
+    mock_completion, mock_sleep, topic_tree
+):
+    rate_limited = litellm.RateLimitError(
+        message="rate limited", llm_provider="ollama", model="mistral"
+    )
+    mock_completion.side_effect = [
+        rate_limited,
+        make_response('{"0": ["a", "b"], "1": ["c", "d"]}'),
+    ]
+
+    subtopics = topic_tree.get_subtopics_batch([["Root", "a"], ["Root", "b"]], 2)
+
+    assert subtopics == [["a", "b"], ["c", "d"]]
+    # The batch is retried as a whole instead of falling back to one call per node
+    assert mock_completion.call_count == 2  # noqa: PLR2004
+    mock_sleep.assert_called_once()
+
+    # A persistent error gives every node defaults without a request per node
+    mock_completion.reset_mock()
+    mock_completion.side_effect = rate_limited
+    subtopics = topic_tree.get_subtopics_batch([["Root", "c"], ["Root", "d"]], 2)
+
+    assert subtopics == [
+        ["subtopic_1_for_c", "subtopic_2_for_c"],
+        ["subtopic_1_for_d", "subtopic_2_for_d"],
+    ]
+    assert mock_completion.call_count == 3  # noqa: PLR2004
+    assert [f["path"] for f in topic_tree.failed_generations] == [
+        ["Root", "c"],
+        ["Root", "d"],
+    ]
+
+
+@patch("promptwright.topic_tree.time.sleep")
+@patch("promptwright.topic_tree.litellm.completion")
+def test_get_subtopics_backs_off_only_on_transient_errors(
+    mock_completion, mock_sleep, topic_tree
+):
+    mock_completion.side_effect = [
+        make_response("not a list"),
+        litellm.RateLimitError(
+            message="rate limited", llm_provider="ollama", model="mistral"
+        ),
+        make_response('["a", "b"]'),
+    ]
+
+    subtopics = topic_tree.get_subtopics("", ["Root"], 2)
+
+    assert subtopics == ["a", "b"]
+    # An unparseable response is retried at once, a rate limit with jitter
+    first_delay, second_delay = (c.args[0] for c in mock_sleep.call_args_list)
+    assert first_delay == 0
+    assert 0 <= second_delay <= 4  # noqa: PLR2004
+
+
+@patch("promptwright.topic_tree.litellm.completion")
+def test_get_subtopics_does_not_retry_rejected_requests(mock_completion, topic_tree):
+    mock_completion.side_effect = litellm.NotFoundError(
+        message="model not found", llm_provider="ollama", model="mistral"
+    )
+
+    subtopics = topic_tree.get_subtopics("", ["Root"], 2)
+
+    assert subtopics == ["subtopic_1_for_Root", "subtopic_2_for_Root"]
+    mock_completion.assert_called_once()
+    assert topic_tree.failed_generations[0]["attempts"] == 1
+
+
+@patch("promptwright.topic_tree.litellm.completion")
+def test_build_subtree(mock_completion, topic_tree):
+    mock_completion.return_value = make_response('["a", "b"]')
+
+    paths = topic_tree.build_subtree(["Root"], "", 2, 2, "test-model")
+
+    assert paths == [
+        ["Root", "a", "a"],
+        ["Root", "a", "b"],
+        ["Root", "b", "a"],
+        ["Root", "b", "b"],
+    ]
+
+
+@pytest.mark.parametrize(
+    "response_text",
+    [
+        '["a", "b"]',
+        '  ["a", "b"]\n',
+        'Here are the subtopics:\n```json\n["a", "b"]\n```',
+    ],
+)
+def test_validate_and_clean_response(response_text):
+    assert validate_and_clean_response(response_text) == ["a", "b"]
+
+
+def test_save_round_trip(topic_tree, tmp_path):
+    topic_tree.tree_paths = [["Root", "Café"], ["Root", "b"]]
+    topic_tree.failed_generations = [
+        {"path": ["Root"], "attempts": 3, "last_error": "boom"}
+    ]
+    save_path = tmp_path / "tree.jsonl"
+
+    topic_tree.save(str(save_path))
+
+    assert read_topic_tree_from_jsonl(str(save_path)) == [
+        {"path": ["Root", "Café"]},
+        {"path": ["Root", "b"]},
+    ]
+    assert read_topic_tree_from_jsonl(str(tmp_path / "tree_failed.jsonl")) == [
+        {"path": ["Root"], "attempts": 3, "last_error": "boom"}
+    ]
+
+
+def test_build_subtopics_prompt():
+    prompt = TopicTree._build_subtopics_prompt("Be concise.", ["Root", "a"], 3)
+
+    assert "{{{{" not in prompt
+    assert "Be concise." in prompt
+    assert "node path: Root -> a" in prompt
+    assert "desired number of subtopics: 3" in prompt
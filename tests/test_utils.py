@@ -0,0 +1,43 @@
+import pytest
+
+from promptwright.utils import extract_enclosed, extract_list, safe_literal_eval
+
+
+@pytest.mark.parametrize(
+    ("text", "expected"),
+    [
+        ('{"a": 1}', '{"a": 1}'),
+        ('Sure:\n```json\n{"a": {"b": 2}}\n```', '{"a": {"b": 2}}'),
+        ("no braces", None),
+        ("} before {", None),
+        ("{ unclosed", None),
+    ],
+)
+def test_extract_enclosed(text, expected):
+    assert extract_enclosed(text, "{", "}") == expected
+
+
+@pytest.mark.parametrize(
+    ("text", "expected"),
+    [
+        ('["a", "b"]', ["a", "b"]),
+        ("Topics: ['a', ['b']] and a stray ]", ["a", ["b"]]),
+        ("Topics: ['a', 'b'", []),
+        ("no list here", []),
+    ],
+)
+def test_extract_list(text, expected):
+    assert extract_list(text) == expected
+
+
+@pytest.mark.parametrize(
+    ("text", "expected"),
+    [
+        ("['a', 'b']", ["a", "b"]),
+        ("['don't stop']", ["don’t stop"]),
+        # Adjacent apostrophes share a letter, so both must be replaced
+        ("['rock'n'roll']", ["rock’n’roll"]),
+    ],
+)
+def test_safe_literal_eval(text, expected):
+    assert safe_literal_eval(text) == expected